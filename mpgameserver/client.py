@@ -203,10 +203,9 @@ class UdpClient(object):
 
                     t0 = self.conn.clock()
                     if t0 - self.conn.last_send_time > self.conn.send_interval:
-                        pkt = self.conn._build_packet()
+                        datagram = self.conn._build_and_encode(self.conn._tx_buf)
 
-                        if pkt is not None:
-                            datagram = self.conn._encode_packet(pkt)
+                        if datagram is not None:
                             self.sock.sendto(datagram, self.addr)
 
                         self.conn._check_timeout(t0)
@@ -65,6 +65,7 @@ import time
 import struct
 import select
 import random
+import heapq
 from typing import Callable, List
 from io import BytesIO
 from .serializable import SerializableType, Serializable, SerializableEnum, serialize_value, deserialize_value
@@ -76,6 +77,10 @@ from .logger import mplogger, PeerLogger
 from .context import ServerContext
 from collections import namedtuple, defaultdict
 
+# encrypt_into was added in newer versions of cryptography. When available
+# the cipher text is written directly into the datagram buffer
+_AESGCM_ENCRYPT_INTO = hasattr(crypto.AESGCM, "encrypt_into")
+
 class PendingMessage(object):
     def __init__(self, seq, type, payload, callback, retry):
         super(PendingMessage, self).__init__()
@@ -101,6 +106,8 @@ class SeqNum(int):
     Sorting is undefined over a large range
     """
 
+    __slots__ = ()
+
     _bytesize: int = 2
     _max_sequence: int = 2**(8*_bytesize) - 1
     _threshold: int = (_max_sequence - 1) // 2
@@ -116,7 +123,18 @@ class SeqNum(int):
             raise ValueError("value exceeds maximum sequence number")
         elif value < 0:
             raise ValueError("sequence numbers must not be negative")
-        return super(SeqNum, cls).__new__(cls, value)  # type: ignore
+
+        if cls is not SeqNum:
+            return super(SeqNum, cls).__new__(cls, value)  # type: ignore
+
+        # sequence numbers are immutable, share a single instance per value
+        try:
+            inst = _seqnum_pool[value]
+        except TypeError:
+            return super(SeqNum, cls).__new__(cls, value)  # type: ignore
+        if inst is None:
+            inst = _seqnum_pool[value] = super(SeqNum, cls).__new__(cls, value)  # type: ignore
+        return inst
 
     def __add__(self, other) -> "SeqNum":
         """
@@ -197,6 +215,14 @@ class SeqNum(int):
         else:
             raise TypeError(str(other))
 
+# instances of SeqNum indexed by value, populated on first use
+_seqnum_pool = [None] * (SeqNum._max_sequence + 1)
+
+# integer subtraction, bypassing the ring arithmetic of SeqNum.__sub__
+_int_sub = int.__sub__
+_seq_max = SeqNum._max_sequence
+_seq_threshold = SeqNum._threshold
+
 class BitField(object):
     """ The bitfield keeps track of recently received messages.
     It uses a one hot encoding to indicate received SeqNum using
@@ -227,11 +253,17 @@ class BitField(object):
         :param seqnum: The Sequence Number
         """
 
-        if self.current_seqnum == 0:
+        current = self.current_seqnum
+        if current == 0:
             self.current_seqnum = seqnum
             return
 
-        diff = self.current_seqnum.diff(seqnum)
+        # inlined SeqNum.diff, this is run for every received datagram
+        diff = _int_sub(current, seqnum)
+        if diff > _seq_threshold:
+            diff -= _seq_max
+        elif diff < -_seq_threshold:
+            diff += _seq_max
 
         if diff < 0:
             self.current_seqnum = seqnum
@@ -254,7 +286,13 @@ class BitField(object):
 
         :param seqnum: The Sequence Number
         """
-        diff = self.current_seqnum.diff(seqnum)
+        # inlined SeqNum.diff
+        diff = _int_sub(self.current_seqnum, seqnum)
+        if diff > _seq_threshold:
+            diff -= _seq_max
+        elif diff < -_seq_threshold:
+            diff += _seq_max
+
         if diff == 0:
             return True
         elif diff > 0:
@@ -319,6 +357,13 @@ class PacketType(SerializableEnum):
     APP              = 0x06  #
     APP_FRAGMENT     = 0x07  #
 
+# the packet header: the 12 byte IV followed by the 8 byte AAD
+_HEADER_STRUCT = struct.Struct(">4sLHHBHBL")
+# message header for a packet with a single message: seq
+_MSG1_STRUCT = struct.Struct(">H")
+# message header for a packet with multiple messages: length, seq, type
+_MSGN_STRUCT = struct.Struct(">HHB")
+
 class PacketHeader(object):
     """
     The Packet Header structure is composed of the following:
@@ -364,6 +409,10 @@ class PacketHeader(object):
     TAG_SIZE = crypto.ENCRYPTION_TAG_LENGTH
     SIZE = IV_SIZE + AAD_SIZE
     OVERHEAD = SIZE + TAG_SIZE
+    OVERHEAD_CRC = SIZE + CRC_SIZE
+
+    __slots__ = ('isServer', 'ctime', 'pkt_type', 'seq', 'ack',
+        'ack_bits', 'length', 'count')
 
     def __init__(self):
         super(PacketHeader, self).__init__()
@@ -385,12 +434,19 @@ class PacketHeader(object):
 
         # set direction identifier and magic number
         ident = PacketIdentifier.TO_CLIENT if self.isServer else PacketIdentifier.TO_SERVER
-        # build the IV
-        hdr = struct.pack(">4sLHH", ident.value, self.ctime, self.seq, self.ack)
-        # additional bytes for AAD
-        hdr += struct.pack(">BHBL", self.pkt_type.value, self.length, self.count, self.ack_bits)
+        # the IV (ident, ctime, seq, ack) followed by the additional bytes for AAD
+        return _HEADER_STRUCT.pack(ident.value, self.ctime, self.seq, self.ack,
+            self.pkt_type.value, self.length, self.count, self.ack_bits)
 
-        return hdr
+    def pack_into(self, buf, offset=0):
+        """ Serialize the packet header into a writable buffer
+
+        :param buf: a bytearray or writable memoryview
+        :param offset: the position in buf to write the header
+        """
+        ident = PacketIdentifier.TO_CLIENT if self.isServer else PacketIdentifier.TO_SERVER
+        _HEADER_STRUCT.pack_into(buf, offset, ident.value, self.ctime,
+            self.seq, self.ack, self.pkt_type.value, self.length, self.count, self.ack_bits)
 
     @staticmethod
     def create(isServer, ctime, pkt_type, seq, ack, ack_bits):
@@ -419,9 +475,10 @@ class PacketHeader(object):
         :param isServer: True when it is the server that is extracting the header
         :param datagram: the bytes to decode
         """
-        hdr = PacketHeader()
+        # every field is assigned below, skip the default initialization
+        hdr = PacketHeader.__new__(PacketHeader)
         ident, time, seq, ack, pkt_type, hdr.length, hdr.count, ack_bits = \
-            struct.unpack(">4sLHHBHBL", datagram[:PacketHeader.SIZE])
+            _HEADER_STRUCT.unpack_from(datagram)
         hdr.ctime = time
         hdr.pkt_type = PacketType(pkt_type)
         hdr.isServer = ident == PacketIdentifier.TO_SERVER.value
@@ -455,7 +512,12 @@ class Packet(object):
 
     # maximum payload size assuming an encrypted + tagged packet
     # packets larger than this value must be fragmented
-    MAX_PAYLOAD_SIZE = MAX_SIZE - PacketHeader.SIZE - PacketHeader.TAG_SIZE - MESSAGE_OVERHEAD_1
+    MAX_PAYLOAD_SIZE = MAX_SIZE - PacketHeader.OVERHEAD - MESSAGE_OVERHEAD_1
+
+    # overhead for n messages, indexed by n. large enough to hold the
+    # maximum number of messages that can fit in a single packet
+    _OVERHEAD = (MESSAGE_OVERHEAD_0, MESSAGE_OVERHEAD_1) + tuple(range(2 * MESSAGE_OVERHEAD_N,
+        MAX_PAYLOAD_SIZE + 2 * MESSAGE_OVERHEAD_N, MESSAGE_OVERHEAD_N))
 
     # allow room for other messages
     MAX_FRAGMENT_SIZE = 1024
@@ -468,27 +530,109 @@ class Packet(object):
         super(Packet, self).__init__()
 
         self.hdr = None
-        self.msg = b''
+        self._msg = b''
         self.msgs = []
 
     def __repr__(self):
-        return "<Packet(%s,%d,%d,%04X,%08X)>" % (self.hdr.pkt_type, len(self.msg), self.hdr.count, self.hdr.seq, self.hdr.ack_bits)
+        return "<Packet(%s,%d,%d,%04X,%08X)>" % (self.hdr.pkt_type, self._length(), self.hdr.count, self.hdr.seq, self.hdr.ack_bits)
 
-    def to_bytes(self, key):
+    @property
+    def msg(self):
+        """ the packet payload, excluding the header and the crc or tag
 
-        if key and self.hdr.pkt_type != PacketType.SERVER_HELLO:
-            hdr = self.hdr.to_bytes()
+        For a packet constructed using create() the payload is only joined
+        when it is accessed, to_bytes() packs the messages into the datagram
+        or, when encrypting, into a scratch buffer.
+        """
+        if self._msg is None:
+            buf = bytearray(self.hdr.length)
+            self._pack_msgs_into(buf, 0)
+            self._msg = bytes(buf)
+        return self._msg
+
+    @msg.setter
+    def msg(self, msg):
+        self._msg = msg
+
+    def _length(self):
+        """ return the length of the payload """
+        if self._msg is None:
+            return self.hdr.length
+        return len(self._msg)
+
+    def _pack_msgs_into(self, buf, offset):
+        """ write the messages into buf starting at offset """
+        msgs = self.msgs
+        if len(msgs) == 1:
+            msg = msgs[0]
+            _MSG1_STRUCT.pack_into(buf, offset, msg.seq)
+            offset += _MSG1_STRUCT.size
+            buf[offset:offset + len(msg.payload)] = msg.payload
+        else:
+            for msg in msgs:
+                length = len(msg.payload)
+                _MSGN_STRUCT.pack_into(buf, offset, length, msg.seq, msg.type.value)
+                offset += _MSGN_STRUCT.size
+                buf[offset:offset + length] = msg.payload
+                offset += length
+
+    def to_bytes(self, key, out=None, scratch=None):
+        """ serialize the packet
+
+        The header, payload and tag or crc are written into a single buffer
+
+        :param key: None, the 16 byte session key, or an AES-GCM cipher
+            constructed from the session key (see ConnectionBase.session_key_bytes)
+        :param out: an optional bytearray, at least total_size(key) bytes long,
+            to serialize the packet into. This allows a single buffer to be reused
+            for every packet.
+        :param scratch: an optional bytearray, at least as long as the payload,
+            used to assemble the messages before they are encrypted into out.
+
+        :return: bytes, or a memoryview of out when out is given
+        """
+
+        size = self.total_size(key)
+        buf = bytearray(size) if out is None else out
+        view = memoryview(buf)
 
-            iv = hdr[:PacketHeader.IV_SIZE]
-            ct_withtag = crypto.encrypt_gcm(key, iv, hdr, self.msg)
+        self.hdr.pack_into(buf, 0)
 
-            return hdr + ct_withtag
+        length = self._length()
+        end = PacketHeader.SIZE + length
+
+        if key and self.hdr.pkt_type != PacketType.SERVER_HELLO:
+            if not isinstance(key, crypto.AESGCM):
+                key = crypto.AESGCM(key)
+
+            if self._msg is None:
+                # the plaintext must not overlap the ciphertext, assemble
+                # the messages in a separate buffer
+                if scratch is None:
+                    scratch = bytearray(length)
+                self._pack_msgs_into(scratch, 0)
+                payload = memoryview(scratch)[:length]
+            else:
+                payload = self._msg
+
+            iv = view[:PacketHeader.IV_SIZE]
+            aad = view[:PacketHeader.SIZE]
+            if _AESGCM_ENCRYPT_INTO:
+                key.encrypt_into(iv, payload, aad, view[PacketHeader.SIZE:size])
+            else:
+                view[PacketHeader.SIZE:size] = key.encrypt(iv, payload, aad)
 
         else:
+            if self._msg is None:
+                # write the messages directly into the datagram
+                self._pack_msgs_into(view, PacketHeader.SIZE)
+            else:
+                view[PacketHeader.SIZE:end] = self._msg
+            struct.pack_into(">L", buf, end, crypto.crc32(view[:end]))
 
-            datagram = self.hdr.to_bytes() + self.msg
-            datagram += struct.pack(">L", crypto.crc32(datagram))
-            return datagram
+        if out is None:
+            return bytes(buf)
+        return view[:size]
 
     def total_size(self, key):
         """
@@ -496,9 +640,9 @@ class Packet(object):
         """
 
         if key and self.hdr.pkt_type != PacketType.SERVER_HELLO:
-            return len(self.msg) + PacketHeader.SIZE + PacketHeader.TAG_SIZE
+            return self._length() + PacketHeader.OVERHEAD
         else:
-            return len(self.msg) + PacketHeader.SIZE + PacketHeader.CRC_SIZE
+            return self._length() + PacketHeader.OVERHEAD_CRC
 
     @staticmethod
     def setMTU(mtu):
@@ -516,10 +660,14 @@ class Packet(object):
         """
         Packet.MTU = mtu
         Packet.MAX_SIZE = Packet.MTU - Packet.UDP_HEADER_SIZE
-        Packet.MAX_PAYLOAD_SIZE = Packet.MAX_SIZE - PacketHeader.SIZE - PacketHeader.TAG_SIZE - Packet.MESSAGE_OVERHEAD_1
+        Packet.MAX_PAYLOAD_SIZE = Packet.MAX_SIZE - PacketHeader.OVERHEAD - Packet.MESSAGE_OVERHEAD_1
 
         Packet.MAX_SIZE_CRC = Packet.MAX_SIZE - PacketHeader.TAG_SIZE + PacketHeader.CRC_SIZE
 
+        Packet._OVERHEAD = (Packet.MESSAGE_OVERHEAD_0, Packet.MESSAGE_OVERHEAD_1) + \
+            tuple(range(2 * Packet.MESSAGE_OVERHEAD_N,
+                Packet.MAX_PAYLOAD_SIZE + 2 * Packet.MESSAGE_OVERHEAD_N, Packet.MESSAGE_OVERHEAD_N))
+
         if Packet.MAX_PAYLOAD_SIZE < 1024 + Packet.FRAGMENT_OVERHEAD:
             Packet.MAX_FRAGMENT_SIZE = Packet.MAX_PAYLOAD_SIZE - Packet.FRAGMENT_OVERHEAD
         else:
@@ -538,13 +686,10 @@ class Packet(object):
 
         """
 
-        if n == 0:
-            return 0
-
-        elif n == 1:
-            return 2
+        if n < len(Packet._OVERHEAD):
+            return Packet._OVERHEAD[n]
 
-        return 5 * n
+        return Packet.MESSAGE_OVERHEAD_N * n
 
     @staticmethod
     def from_bytes(hdr, key, datagram):
@@ -560,7 +705,10 @@ class Packet(object):
             iv = datagram[:PacketHeader.IV_SIZE]
             aad = datagram[:PacketHeader.SIZE]
             data = datagram[PacketHeader.SIZE:length]
-            pkt.msg = crypto.decrypt_gcm(key, iv, aad, data)
+            if isinstance(key, crypto.AESGCM):
+                pkt.msg = key.decrypt(iv, data, aad)
+            else:
+                pkt.msg = crypto.decrypt_gcm(key, iv, aad, data)
         else:
             # packet is not encrypted: validate the crc
             data = datagram[:length]
@@ -602,27 +750,26 @@ class Packet(object):
 
         hdr: PacketHeader
         msgs: list of PendingMessage
+
+        The payload is not constructed until it is needed. See Packet.msg
         """
 
         if len(msgs) == 0:
-            payload = b""
+            length = 0
         elif len(msgs) == 1:
-            payload = struct.pack(">H", msgs[0].seq) + msgs[0].payload
+            length = _MSG1_STRUCT.size + len(msgs[0].payload)
         else:
-            payload = []
+            length = _MSGN_STRUCT.size * len(msgs)
             for msg in msgs:
-                payload.append(struct.pack(">HHB", len(msg.payload), msg.seq, msg.type.value))
-                payload.append(msg.payload)
-            # join can be faster than byte addition
-            payload = b"".join(payload)
+                length += len(msg.payload)
 
         pkt = Packet()
 
-        hdr.length = len(payload)
+        hdr.length = length
         hdr.count = len(msgs)
 
         pkt.hdr = hdr
-        pkt.msg = payload
+        pkt.msg = None if msgs else b""
         pkt.msgs = msgs
 
         return pkt
@@ -976,6 +1123,7 @@ class ConnectionBase(object):
         self.outgoing_messages = [] # queue of messages to send
 
         self.pending_acks = {}      # seqnum -> send time
+        self._ack_deadlines = []    # heap of (send time, seqnum), see _check_timeout
         self.pending_callbacks = {} # seqnum -> fn(success)
         #self.pending_messages = {}  # seqnum -> (typ, msg)
         self.pending_fragments = {} # frag_seq -> FragmentSender
@@ -1018,6 +1166,20 @@ class ConnectionBase(object):
         self.stats.bytes_recv = [0]*5*60
         self.stats.latency = [0]*5*60
 
+        # plaintext buffer for outgoing packets, see Packet.to_bytes
+        self._tx_scratch = bytearray(Packet.RECV_SIZE)
+
+    @property
+    def session_key_bytes(self):
+        """ the datagram encryption key """
+        return self._session_key_bytes
+
+    @session_key_bytes.setter
+    def session_key_bytes(self, key):
+        self._session_key_bytes = key
+        # construct the cipher once per session instead of once per packet
+        self._session_cipher = crypto.AESGCM(key) if key else None
+
     def timedout(self, timeout):
         """ Test if the connection has timed out.
 
@@ -1077,6 +1239,7 @@ class ConnectionBase(object):
             self.pending_callbacks = {}
             self.pending_retry = {}
             self.pending_acks = {}
+            self._ack_deadlines = []
             # cancel all pending messages
             #for seq in list(self.pending_acks):
             #    self._handle_timeout(seq)
@@ -1085,10 +1248,25 @@ class ConnectionBase(object):
 
         self.status = ConnectionStatus.DISCONNECTED
 
-    def _check_timeout(self, t0):
-        for seqnum in list(self.pending_acks):
-            if t0 - self.pending_acks[seqnum] >= self.outgoing_timeout:
-                self._handle_timeout(seqnum)
+    def _check_timeout(self, t0, strict=False):
+        # the heap is ordered by send time, even if the clock stepped
+        # backwards, so the scan can stop at the first packet that has not
+        # timed out. entries for packets that were already acked, or whose
+        # sequence number was reused, are discarded as they reach the top.
+        # the server only expires packets strictly older than the timeout
+        timeout = self.outgoing_timeout
+        pending = self.pending_acks
+        heap = self._ack_deadlines
+        while heap:
+            send_time, seqnum = heap[0]
+            if pending.get(seqnum) != send_time:
+                heapq.heappop(heap)
+                continue
+            age = t0 - send_time
+            if age < timeout or (strict and age == timeout):
+                break
+            heapq.heappop(heap)
+            self._handle_timeout(seqnum)
 
     def _send_type(self, pkt_type, payload, retry, callback):
         self.seq_message += 1
@@ -1118,6 +1296,9 @@ class ConnectionBase(object):
         """
 
         pkt_type = PacketType.UNKNOWN
+        # message overhead lookup table. indexing by the number of messages
+        # is safe because a packet can never hold more than len(overhead)-1
+        overhead = Packet._OVERHEAD
         msgs = [] # messages (seq, typ, msg) to include in this packet
         current_msg_length = 0 # sum of length of messages in msgs, excluding overhead
 
@@ -1135,7 +1316,7 @@ class ConnectionBase(object):
                     continue
 
                 # calculate the size of the packet so far + this message
-                size = len(msg.payload) + Packet.overhead(1+len(msgs)) + current_msg_length
+                size = len(msg.payload) + overhead[1+len(msgs)] + current_msg_length
                 # if the message fits add it to the packet
                 if size <= Packet.MAX_PAYLOAD_SIZE:
                     del self.pending_retry_msg[msgseq]
@@ -1152,7 +1333,7 @@ class ConnectionBase(object):
             pending = self.outgoing_messages[idx]
 
             # calculate the size of the packet so far + this message
-            size = len(pending.payload) + Packet.overhead(1+len(msgs)) + current_msg_length
+            size = len(pending.payload) + overhead[1+len(msgs)] + current_msg_length
             # if the message fits add it to the packet
             if size <= Packet.MAX_PAYLOAD_SIZE:
                 self.outgoing_messages.pop(idx)
@@ -1179,6 +1360,7 @@ class ConnectionBase(object):
         # can be processed later
         self.seq_sending += 1
         self.pending_acks[self.seq_sending] = current_time
+        heapq.heappush(self._ack_deadlines, (current_time, self.seq_sending))
         callbacks = []
         retries = []
         for msg in msgs:
@@ -1237,9 +1419,24 @@ class ConnectionBase(object):
             self.stats.assembled += 1
         return pkt
 
-    def _encode_packet(self, pkt):
+    def _build_and_encode(self, out):
+        """ build a packet, if there are any pending messages, and encode it into out
+
+        When encrypting, the messages are assembled in a scratch buffer owned
+        by the connection and encrypted into out. Otherwise they are written
+        directly into out.
+
+        :param out: a bytearray at least Packet.RECV_SIZE bytes long
+        :return: a memoryview of the datagram, or None if there is nothing to send
+        """
+        pkt = self._build_packet()
+        if pkt is None:
+            return None
+        return self._encode_packet(pkt, out)
+
+    def _encode_packet(self, pkt, out=None):
         try:
-            datagram = pkt.to_bytes(self.session_key_bytes)
+            datagram = pkt.to_bytes(self._session_cipher, out, self._tx_scratch)
         except Exception as e:
             raise
 
@@ -1254,7 +1451,7 @@ class ConnectionBase(object):
         # ensure that this packet validates correctly
 
         try:
-            pkt = Packet.from_bytes(hdr, self.session_key_bytes, datagram)
+            pkt = Packet.from_bytes(hdr, self._session_cipher, datagram)
         except Exception as e:
             #self.log.exception("unable to decode packet %s", hdr)
             self.stats.dropped += 1
@@ -1465,6 +1662,9 @@ class ClientServerConnection(ConnectionBase):
         self.time_client_hello_sent = 0
         self.connection_callback = None
 
+        # reused output buffer for outgoing datagrams, see _build_and_encode
+        self._tx_buf = bytearray(Packet.RECV_SIZE)
+
     def setServerPublicKey(self, key):
         self.server_public_key = key
 
@@ -1616,16 +1816,13 @@ class ServerClientConnection(ConnectionBase):
         if self.clock() - self.last_send_time > self.send_interval:
             pkt = self._build_packet()
 
-            t0 = self.clock()
-            for seqnum in list(self.pending_acks):
-                if t0 - self.pending_acks[seqnum] > self.outgoing_timeout:
-                    self._handle_timeout(seqnum)
+            self._check_timeout(self.clock(), strict=True)
 
         if pkt:
             self.stats.pkts_sent[-1] += 1
-            self.stats.bytes_sent[-1] += pkt.total_size(self.session_key_bytes)
+            self.stats.bytes_sent[-1] += pkt.total_size(self._session_cipher)
 
-            return pkt, self.session_key_bytes, self.addr
+            return pkt, self._session_cipher, self.addr
         return None
 
     def send_guaranteed(self, payload: bytes, callback:SendCallback=None):
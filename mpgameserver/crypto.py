@@ -49,6 +49,7 @@ import time
 import binascii
 import argparse
 import select
+import zlib
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM, AESCCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives.ciphers import Cipher
@@ -90,10 +91,9 @@ ENCRYPTION_SALT_LENGTH = 16
 ENCRYPTION_TAG_LENGTH = 16
 ENCRYPTION_IV_LENGTH = 12
 
-def crc32(data):
-    """ compute 32-bit checksum
-    """
-    return binascii.crc32(data) & 0xFFFFFFFF
+# compute 32-bit checksum. zlib implements crc32 in C (using carry-less
+# multiplication on supported CPUs) and always returns an unsigned value
+crc32 = zlib.crc32
 
 def encrypt_gcm(key, iv, aad, data):
     """
@@ -116,6 +116,8 @@ class MessageDispatcher(object):
         super(MessageDispatcher, self).__init__()
         # a map of event type to callable
         self.registered_events = {}
+        # a cache of message class to callable, populated on first dispatch
+        self._handlers = {}
 
     def register(self, resource):
         """ register all methods of a given resource
@@ -148,6 +150,7 @@ class MessageDispatcher(object):
         if event_type in self.registered_events:
             raise Exception("duplicate function registered for %s" % event_type)
         self.registered_events[event_type] = fn
+        self._handlers.clear()
 
 
     def unregister_function(self, event_type):
@@ -161,6 +164,19 @@ class MessageDispatcher(object):
         if event_type in self.registered_events:
             raise Exception("duplicate function registered for %s" % event_type)
         del self.registered_events[event_type]
+        self._handlers.clear()
+
+    def _resolve(self, T):
+        """ return the registered handler for a message class
+
+        The handler is cached by class so that subsequent dispatches
+        for the same message type are a single dictionary lookup
+        """
+        fn = self.registered_events.get(T.__name__)
+        if fn is None:
+            raise DispatchError(T.__name__)
+        self._handlers[T] = fn
+        return fn
 
     def dispatch(self):
 
@@ -190,9 +206,10 @@ class ServerMessageDispatcher(MessageDispatcher):
         """
 
         T = type(msg)
-        if T.__name__ not in self.registered_events:
-            raise DispatchError(T.__name__)
-        self.registered_events[T.__name__](client, seqnum, msg)
+        fn = self._handlers.get(T)
+        if fn is None:
+            fn = self._resolve(T)
+        fn(client, seqnum, msg)
 
 class ClientMessageDispatcher(MessageDispatcher):
     """ An Event Dispatcher for server events
@@ -215,7 +232,8 @@ class ClientMessageDispatcher(MessageDispatcher):
         :param msg: the message received from the server
         """
         T = type(msg)
-        if T.__name__ not in self.registered_events:
-            raise DispatchError(T.__name__)
-        self.registered_events[T.__name__](seqnum, msg)
+        fn = self._handlers.get(T)
+        if fn is None:
+            fn = self._resolve(T)
+        fn(seqnum, msg)
 
@@ -105,10 +105,21 @@ class ErrorResponse(Response):
     def __init__(self, obj, status_code=400, headers=None):
         super(ErrorResponse, self).__init__(obj, status_code, headers)
 
+# the encoded body of a JsonResponse containing an empty object
+_EMPTY_JSON_BODY = b"{}\n"
+
 class JsonResponse(Response):
     def __init__(self, obj, status_code=200, headers=None):
         super(JsonResponse, self).__init__(obj, status_code, headers)
 
+    @classmethod
+    def empty(cls, status_code=200, headers=None):
+        """ return a response with an empty json object as the body
+
+        The encoded body is shared by all empty responses
+        """
+        return cls({}, status_code, headers)
+
     def _get_payload(self, request):
         """ return the payload in a form suitable for sending to the client
         """
@@ -116,7 +127,10 @@ class JsonResponse(Response):
         # TODO: support compression (copy from above)
 
         payload = super()._get_payload(request)
-        encoded = json.dumps(payload).encode('utf-8') + b"\n"
+        if type(payload) is dict and not payload:
+            encoded = _EMPTY_JSON_BODY
+        else:
+            encoded = json.dumps(payload).encode('utf-8') + b"\n"
         self.headers['Content-Type'] = "application/json"
         self.headers['Content-Length'] = str(len(encoded))
         return encoded
@@ -888,6 +902,11 @@ class Router(object):
         }
         self.routes = []
 
+        # method -> (regex, {group index: (tokens, route)})
+        # the routes for each method are combined into a single regex
+        # so that a path can be matched with a single call
+        self._compiled = {method: None for method in self.route_table}
+
         # a rate limiter which limits requests per IP
         # to 100 requests per minute, for up to 1024 clients
         self.limiter = RateLimiter(5, 60*1000, 1024)
@@ -910,6 +929,34 @@ class Router(object):
             self.route_table[route.method].append((regex, tokens, route))
             self.routes.append(route)
 
+        self._compile()
+
+    def _compile(self):
+        """ private method
+
+        combine the route patterns for each method into a single regex.
+
+        Each route pattern is wrapped in a capture group. The alternation
+        is tried in registration order so the first matching route
+        is selected. The outer group of the matching route is the last
+        group closed, which identifies the route by index.
+        """
+
+        for method, table in self.route_table.items():
+            if not table:
+                self._compiled[method] = None
+                continue
+
+            parts = []
+            groups = {}
+            index = 1
+            for regex, tokens, route in table:
+                parts.append("(%s)" % regex.pattern)
+                groups[index] = (tokens, route)
+                index += 1 + regex.groups
+
+            self._compiled[method] = (re.compile("|".join(parts)), groups)
+
     def getRoute(self, method, path):
         """ private method
 
@@ -919,10 +966,16 @@ class Router(object):
             mplogger.error("unsupported method: %s", method)
             return None
 
-        for re_ptn, tokens, endpt in self.route_table[method]:
-            m = re_ptn.match(path)
-            if m:
-                return endpt, {k: v for k, v in zip(tokens, m.groups())}
+        compiled = self._compiled[method]
+        if compiled is None:
+            return None
+
+        regex, groups = compiled
+        m = regex.match(path)
+        if m:
+            index = m.lastindex
+            tokens, endpt = groups[index]
+            return endpt, dict(zip(tokens, m.groups()[index:index + len(tokens)]))
         return None
 
     def patternToTemplate(self, pattern):
@@ -1021,21 +1074,31 @@ class Router(object):
         if self.limiter.insert(request.client_address[0]):
             response = JsonResponse({'error': 'Too Many Requests'}, 429)
         else:
+            response = self.dispatch_request(request)
 
-            result = self.getRoute(request.method, request.path)
+        return response
 
-            if not result:
-                response = JsonResponse({'error': 'path not found'}, 404)
-            else:
+    def dispatch_request(self, request, websocket=True):
+        """ call the route matching the request, bypassing the rate limiter
 
-                endpt, matches = result
-                request.matches = matches
-                if endpt.websocket:
-                    response = upgrade_websocket(endpt, request)
-                else:
-                    response = request_response(endpt, request)
+        :param request: the Request to dispatch
+        :param websocket: when False, requests for websocket routes are rejected
+        :returns: the Response
+        """
 
-        return response
+        result = self.getRoute(request.method, request.path)
+
+        if not result:
+            return JsonResponse({'error': 'path not found'}, 404)
+
+        endpt, matches = result
+        request.matches = matches
+        if endpt.websocket:
+            if not websocket:
+                return JsonResponse({'error': 'websocket not supported in testing'}, 500)
+            return upgrade_websocket(endpt, request)
+
+        return request_response(endpt, request)
 
 class TestClient(object):
     def __init__(self, router):
@@ -1043,7 +1106,11 @@ class TestClient(object):
 
         self.router = router
 
+        # route name -> (template, tokens, required)
+        self._templates = {}
+
         for route in router.routes:
+            self._templates[route.name] = router.patternToTemplate(route.pattern)
             name = route.name.replace(".", "_")
             fn = lambda *args, _route=route, **kwargs: self._call(_route, args, **kwargs)
 
@@ -1081,7 +1148,7 @@ class TestClient(object):
         return bytesdict
 
     def _build_request(self, route, args, params=None, fragment=None, headers=None, body=None):
-        template, tokens, required = self.router.patternToTemplate(route.pattern)
+        template, tokens, required = self._templates[route.name]
 
         if len(args) < required:
             raise ValueError("expected %d positional arguments, found %d" % (
@@ -1093,7 +1160,7 @@ class TestClient(object):
         path = template.format(**kwargs)
         # append wild card args
         if len(args) > len(tokens):
-            path += "".join(["/%s" % s for s in args[len(tokens):]])
+            path += "/" + "/".join(map(str, args[len(tokens):]))
 
         headers = self._coerce_dict(headers)
 
@@ -1107,18 +1174,7 @@ class TestClient(object):
         request = self._build_request(route, args, params, fragment, headers, body)
 
         try:
-            result = self.router.getRoute(request.method, request.path)
-
-            if not result:
-                response = JsonResponse({'error': 'path not found'}, 404)
-
-            else:
-                endpt, matches = result
-                request.matches = matches
-                if endpt.websocket:
-                    response = JsonResponse({'error': 'websocket not supported in testing'}, 500)
-                else:
-                    response = request_response(endpt, request)
+            response = self.router.dispatch_request(request, websocket=False)
         except Exception as e:
             e.request = request
             raise
@@ -70,6 +70,7 @@ import sys
 from io import BytesIO
 from enum import Enum
 import gzip
+import zlib
 
 from .logger import mplogger
 
@@ -78,6 +79,9 @@ MAX_BYTES_LENGTH = 2**20
 
 MAX_ARRAY_LENGTH = 2**14
 
+# types which are accepted in place of a stream when deserializing
+_BYTES_TYPES = (bytes, bytearray, memoryview)
+
 def _default():
     class Default(object):
         def __repr__(self):
@@ -113,6 +117,28 @@ class SerializableBaseTypes(object):
     map_t    = 17
     set_t    = 18
 
+# precompiled encoders for the type header and the fixed width base types
+_S_HEADER = struct.Struct(">H")
+_S_BOOL = struct.Struct(">H?")
+_S_INT8 = struct.Struct(">Hb")
+_S_INT16 = struct.Struct(">Hh")
+_S_INT32 = struct.Struct(">Hl")
+_S_INT64 = struct.Struct(">Hq")
+_S_FLOAT32 = struct.Struct(">Hf")
+
+_HEADER_STRING = _S_HEADER.pack(SerializableBaseTypes.string_t)
+_HEADER_BYTES = _S_HEADER.pack(SerializableBaseTypes.bytes_t)
+_HEADER_NULL = _S_HEADER.pack(SerializableBaseTypes.null_t)
+_HEADER_SEQ = _S_HEADER.pack(SerializableBaseTypes.seq_t)
+_HEADER_MAP = _S_HEADER.pack(SerializableBaseTypes.map_t)
+_HEADER_SET = _S_HEADER.pack(SerializableBaseTypes.set_t)
+
+# placeholder type for a field without an annotation, see _json_schema
+_NO_ANNOTATION = object()
+
+def _missing_annotation(cls, field):
+    return KeyError("missing annotation for %s.%s" % (cls.__name__, field))
+
 def ispublic(cls, name):
     return not name.startswith("_") and name != 'type_id' and not callable(getattr(cls, name))
 
@@ -129,9 +155,24 @@ class SerializableType(type):
     next_type_id = 128
     custom_id = {}
     registry = {}
+    # dense copy of the registry, indexed by type_id, for fast decoding
+    registry_list = []
     names = {}
 
-    def __new__(metacls, name, bases, namespace):
+    def __new__(metacls, name, bases, namespace, slots=False):
+        defaults = None
+        if slots:
+            # move the default values out of the class body so that
+            # each field can be stored in a slot instead of a __dict__
+            defaults = {}
+            for field, value in namespace.items():
+                if not field.startswith("_") and field != 'type_id' and \
+                   not callable(value) and \
+                   not isinstance(value, (staticmethod, classmethod, property)):
+                    defaults[field] = value
+            for field in defaults:
+                del namespace[field]
+            namespace['__slots__'] = tuple(defaults)
         cls = super().__new__(metacls, name, bases, namespace)
         # allow a user to specify exactly the type_id in the class def
         # or generate a new type_id when one is not defined.
@@ -152,15 +193,47 @@ class SerializableType(type):
             raise ValueError("Serializable ID %d:%s already in use" % (cls.type_id, cls))
         if cls.__name__ in SerializableType.names:
             raise ValueError("Serializable Name %d:%s already in use" % (cls.type_id, cls.__name__))
-        SerializableType.registry[cls.type_id] = cls
-        SerializableType.names[cls.__name__] = cls
+        SerializableType.register(cls)
         # TODO: use the __annotations__ to determine fields without default values
-        cls._fields = tuple(name for name in cls.__dict__ if ispublic(cls, name))
+        if defaults is not None:
+            # the defaults of slotted base classes are not class attributes,
+            # merge them so that __init__ also assigns the inherited fields
+            merged = {}
+            for base in reversed(bases):
+                merged.update(getattr(base, '_defaults', {}))
+            merged.update(defaults)
+            cls._defaults = merged
+            cls._fields = tuple(defaults)
+        else:
+            cls._fields = tuple(name for name in cls.__dict__ if ispublic(cls, name))
         for field in cls._fields:
             if field not in cls.__annotations__:
                 mplogger.info("missing annotation for %s.%s\n" % (cls.__name__, field))
+        # resolve the generic type of each field once, for fromJson and toJson
+        schema = []
+        for field in cls._fields:
+            type_ = cls.__annotations__.get(field, _NO_ANNOTATION)
+            schema.append((field, type_, get_origin(type_), get_args(type_)))
+        cls._json_schema = tuple(schema)
+        # Serializable.serialize dispatches to the generated field writer
+        # through type(self), so super().serialize() writes the fields
+        # of the most derived class
+        cls._serialize_fields = _compile_serialize(cls)
         return cls
 
+    @staticmethod
+    def register(cls):
+        """ private add a class to the registry, using the class type_id
+        """
+        SerializableType.registry[cls.type_id] = cls
+        SerializableType.names[cls.__name__] = cls
+        cls._type_id_bytes = _S_HEADER.pack(cls.type_id)
+
+        registry_list = SerializableType.registry_list
+        if cls.type_id >= len(registry_list):
+            registry_list.extend([None] * (cls.type_id + 1 - len(registry_list)))
+        registry_list[cls.type_id] = cls
+
     @staticmethod
     def setRootId(module, base_type_id):
         """
@@ -184,7 +257,7 @@ class SerializableType(type):
         SerializableType.custom_id[module] = base_type_id
 
 def serialize_bool(stream, value):
-    stream.write(struct.pack(">H?", SerializableBaseTypes.bool_t, value))
+    stream.write(_S_BOOL.pack(SerializableBaseTypes.bool_t, value))
 
 def serialize_int(stream, value):
 
@@ -192,27 +265,27 @@ def serialize_int(stream, value):
     #print(struct.unpack(">l", b"\x7F\xFF\xFF\xFF"))
     a = abs(value)
     if a > 0x7FFFFFFF:
-        stream.write(struct.pack(">Hq", SerializableBaseTypes.int64_t, value))
+        stream.write(_S_INT64.pack(SerializableBaseTypes.int64_t, value))
     elif a > 0x7FFF:
-        stream.write(struct.pack(">Hl", SerializableBaseTypes.int32_t, value))
+        stream.write(_S_INT32.pack(SerializableBaseTypes.int32_t, value))
     elif a > 0x7F:
-        stream.write(struct.pack(">Hh", SerializableBaseTypes.int16_t, value))
+        stream.write(_S_INT16.pack(SerializableBaseTypes.int16_t, value))
     else:
-        stream.write(struct.pack(">Hb", SerializableBaseTypes.int8_t, value))
+        stream.write(_S_INT8.pack(SerializableBaseTypes.int8_t, value))
 
 def serialize_float(stream, value):
     """
     floating point values are always serialized to a 4 byte float.
     """
-    stream.write(struct.pack(">Hf", SerializableBaseTypes.float32_t, value))
+    stream.write(_S_FLOAT32.pack(SerializableBaseTypes.float32_t, value))
 
 def serialize_string(stream, value):
 
     enc = value.encode("utf-8")
     if len(enc) > MAX_BYTES_LENGTH:
-        raise ValueError("string length too large: %d" % length)
+        raise ValueError("string length too large: %d" % len(enc))
 
-    stream.write(struct.pack(">H", SerializableBaseTypes.string_t))
+    stream.write(_HEADER_STRING)
     serialize_int(stream, len(enc))
     stream.write(enc)
 
@@ -221,12 +294,12 @@ def serialize_bytes(stream, value):
     if len(value) > MAX_BYTES_LENGTH:
         raise ValueError("string length too large: %d" % len(value))
 
-    stream.write(struct.pack(">H", SerializableBaseTypes.bytes_t))
+    stream.write(_HEADER_BYTES)
     serialize_int(stream, len(value))
     stream.write(value)
 
 def serialize_null(stream, value):
-    stream.write(struct.pack(">H", SerializableBaseTypes.null_t))
+    stream.write(_HEADER_NULL)
 
 serialize_types = {
     bool: serialize_bool,
@@ -240,11 +313,12 @@ serialize_types = {
 def serialize_value(stream, value, _field=None, **kwargs):
 
     t = type(value)
+    fn = serialize_types.get(t)
 
-    if t in serialize_types:
+    if fn is not None:
         err = None
         try:
-            serialize_types[t](stream, value)
+            fn(stream, value)
         except struct.error as e:
             err = ValueError("unable to serialize %s %r: %s" % (t.__name__, value, e))
         if err:
@@ -264,7 +338,7 @@ def serialize_value(stream, value, _field=None, **kwargs):
 def serialize_map(stream, value):
     if len(value) > MAX_ARRAY_LENGTH:
         raise ValueError("map is too long")
-    stream.write(struct.pack(">H", SerializableBaseTypes.map_t))
+    stream.write(_HEADER_MAP)
     serialize_value(stream, len(value))
     for k, v in value.items():
         serialize_value(stream, k)
@@ -273,7 +347,7 @@ def serialize_map(stream, value):
 def serialize_seq(stream, value):
     if len(value) > MAX_ARRAY_LENGTH:
         raise ValueError("sequence is too long")
-    stream.write(struct.pack(">H", SerializableBaseTypes.seq_t))
+    stream.write(_HEADER_SEQ)
     serialize_value(stream, len(value))
     for v in value:
         serialize_value(stream, v)
@@ -281,7 +355,7 @@ def serialize_seq(stream, value):
 def serialize_set(stream, value):
     if len(value) > MAX_ARRAY_LENGTH:
         raise ValueError("set is too long")
-    stream.write(struct.pack(">H", SerializableBaseTypes.set_t))
+    stream.write(_HEADER_SET)
     serialize_value(stream, len(value))
     for v in value:
         serialize_value(stream, v)
@@ -291,6 +365,27 @@ serialize_types[tuple] = serialize_seq
 serialize_types[list] = serialize_seq
 serialize_types[set] = serialize_set
 
+def _compile_serialize(cls):
+    """ private generate the field writer used by Serializable.serialize
+
+    The field loop is unrolled into straight line code and the field
+    count is encoded once, when the class is defined.
+    """
+
+    stream = BytesIO()
+    serialize_value(stream, len(cls._fields))
+
+    lines = ["def _serialize_fields(self, stream):"]
+    lines.append("    stream.write(%r)" % stream.getvalue())
+    for field in cls._fields:
+        lines.append("    serialize_value(stream, self.%s, %r)" % (field, field))
+
+    namespace = {}
+    exec("\n".join(lines), {'serialize_value': serialize_value}, namespace)
+    fn = namespace['_serialize_fields']
+    fn.__qualname__ = "%s._serialize_fields" % cls.__qualname__
+    return fn
+
 def serialize_registry(stream, **kwargs):
 
     serialize_value(stream, len(SerializableType.registry), **kwargs)
@@ -306,17 +401,29 @@ class SerializableError(Exception):
 class SerializableHeaderError(SerializableError):
     pass
 
-deserialize_bool_t    = lambda stream, **kwargs: struct.unpack(">?", stream.read(1))[0]
-deserialize_int8_t    = lambda stream, **kwargs: struct.unpack(">b", stream.read(1))[0]
-deserialize_int16_t   = lambda stream, **kwargs: struct.unpack(">h", stream.read(2))[0]
-deserialize_int32_t   = lambda stream, **kwargs: struct.unpack(">l", stream.read(4))[0]
-deserialize_int64_t   = lambda stream, **kwargs: struct.unpack(">q", stream.read(8))[0]
-deserialize_uint8_t   = lambda stream, **kwargs: struct.unpack(">B", stream.read(1))[0]
-deserialize_uint16_t  = lambda stream, **kwargs: struct.unpack(">H", stream.read(2))[0]
-deserialize_uint32_t  = lambda stream, **kwargs: struct.unpack(">L", stream.read(4))[0]
-deserialize_uint64_t  = lambda stream, **kwargs: struct.unpack(">Q", stream.read(8))[0]
-deserialize_float32_t = lambda stream, **kwargs: struct.unpack(">f", stream.read(4))[0]
-deserialize_float64_t = lambda stream, **kwargs: struct.unpack(">d", stream.read(8))[0]
+_unpack_bool    = struct.Struct(">?").unpack
+_unpack_int8    = struct.Struct(">b").unpack
+_unpack_int16   = struct.Struct(">h").unpack
+_unpack_int32   = struct.Struct(">l").unpack
+_unpack_int64   = struct.Struct(">q").unpack
+_unpack_uint8   = struct.Struct(">B").unpack
+_unpack_uint16  = struct.Struct(">H").unpack
+_unpack_uint32  = struct.Struct(">L").unpack
+_unpack_uint64  = struct.Struct(">Q").unpack
+_unpack_float32 = struct.Struct(">f").unpack
+_unpack_float64 = struct.Struct(">d").unpack
+
+deserialize_bool_t    = lambda stream, **kwargs: _unpack_bool(stream.read(1))[0]
+deserialize_int8_t    = lambda stream, **kwargs: _unpack_int8(stream.read(1))[0]
+deserialize_int16_t   = lambda stream, **kwargs: _unpack_int16(stream.read(2))[0]
+deserialize_int32_t   = lambda stream, **kwargs: _unpack_int32(stream.read(4))[0]
+deserialize_int64_t   = lambda stream, **kwargs: _unpack_int64(stream.read(8))[0]
+deserialize_uint8_t   = lambda stream, **kwargs: _unpack_uint8(stream.read(1))[0]
+deserialize_uint16_t  = lambda stream, **kwargs: _unpack_uint16(stream.read(2))[0]
+deserialize_uint32_t  = lambda stream, **kwargs: _unpack_uint32(stream.read(4))[0]
+deserialize_uint64_t  = lambda stream, **kwargs: _unpack_uint64(stream.read(8))[0]
+deserialize_float32_t = lambda stream, **kwargs: _unpack_float32(stream.read(4))[0]
+deserialize_float64_t = lambda stream, **kwargs: _unpack_float64(stream.read(8))[0]
 deserialize_null_t    = lambda stream, **kwargs: None
 
 deserialize_types = {
@@ -348,26 +455,28 @@ def deserialize_value(stream, **kwargs):
     buf = stream.read(2)
     if len(buf) != 2:
         raise SerializableHeaderError("unexpected end of stream")
-    type_id, = struct.unpack(">H", buf)
-
-    registry = kwargs.get('registry', SerializableType.registry)
+    type_id, = _unpack_uint16(buf)
 
-    if type_id in deserialize_types:
-        typ_ = deserialize_types[type_id]
-    elif type_id in registry:
-        typ_ = registry[type_id]
+    fn = deserialize_types.get(type_id)
+    if fn is not None:
+        typ_ = fn
     else:
-        raise SerializableHeaderError("invalid type_id: %d" % type_id)
+        registry = kwargs.get('registry')
+        if registry is None:
+            registry_list = SerializableType.registry_list
+            typ_ = registry_list[type_id] if type_id < len(registry_list) else None
+        else:
+            typ_ = registry.get(type_id)
+
+        if typ_ is None:
+            raise SerializableHeaderError("invalid type_id: %d" % type_id)
 
     try:
-        if type_id in deserialize_types:
-            return deserialize_types[type_id](stream, **kwargs)
-        elif type_id in registry:
-            obj = registry[type_id]()
-            obj.deserialize(stream, **kwargs)
-            return obj
-        else:
-            raise ValueError("invalid type_id %d" % type_id)
+        if fn is not None:
+            return fn(stream, **kwargs)
+        obj = typ_()
+        obj.deserialize(stream, **kwargs)
+        return obj
     except SerializableHeaderError as e:
         # a subfield failed to deserialize
         # raise a new error with the last type that successfully decoded
@@ -454,6 +563,9 @@ deserialize_types[SerializableBaseTypes.set_t] = deserialize_set
 
 def deserialize_registry(stream, **kwargs):
 
+    if isinstance(stream, _BYTES_TYPES):
+        stream = BytesIO(stream)
+
     obj = {}
     length = deserialize_value(stream, **kwargs)
     for i in range(length):
@@ -502,10 +614,27 @@ class Serializable(object, metaclass=SerializableType):
     type_id is a special attribute which can be set in the class definition
     to override the type_id used for the class. Values less than 256 are
     reserverd for use by MpGameServer.
+
+    Pass `slots=True` in the class definition to store fields in `__slots__`
+    instead of a per-instance `__dict__`. This reduces the memory used by each
+    instance, but attributes that are not fields can no longer be assigned.
+
+    ```python
+    class Position(Serializable, slots=True):
+        x: int = 0
+        y: int = 0
+    ```
     """
+    __slots__ = ()
+
+    # default field values for classes defined with slots=True
+    _defaults = {}
 
     def __init__(self, **kwargs):
 
+        for attr, value in self._defaults.items():
+            setattr(self, attr, value)
+
         for attr, t in self.__annotations__.items():
             if isinstance(t, Serializable) or \
                t in (dict, list, set, tuple):
@@ -532,7 +661,7 @@ class Serializable(object, metaclass=SerializableType):
         :param stream: a file like object opened for writing bytes to.
 
         """
-        stream.write(struct.pack(">H", self.type_id))
+        stream.write(self._type_id_bytes)
 
     def serialize(self, stream, **kwargs):
 
@@ -543,9 +672,7 @@ class Serializable(object, metaclass=SerializableType):
 
         """
         #stream.write(struct.pack(">H", self.type_id))
-        serialize_value(stream, len(self._fields))
-        for field in self._fields:
-            serialize_value(stream, getattr(self, field), field)
+        type(self)._serialize_fields(self, stream)
 
     def deserialize(self, stream, **kwargs):
         """populate member attributes by reading fields from a stream.
@@ -597,28 +724,31 @@ class Serializable(object, metaclass=SerializableType):
 
     def dumpz(self, **kwargs):
         """ private get a compressed byte representation
+
+        The output is a zlib stream compressed with the fastest level.
+        Messages are small, so the ratio is close to the best level.
         """
-        stream = BytesIO()
-        wrapper = gzip.open(stream, "wb")
-        self.serialize_header(wrapper)
-        self.serialize(wrapper, **kwargs)
-        wrapper.close()
-        return stream.getvalue()
+        return zlib.compress(self.dumpb(**kwargs), 1)
 
     @staticmethod
     def loadb(stream, **kwargs):
-        if isinstance(stream, bytes):
+        if isinstance(stream, _BYTES_TYPES):
             stream = BytesIO(stream)
         return deserialize_value(stream, **kwargs)
 
     @staticmethod
     def loadz(stream, **kwargs):
         """ private load from a compressed stream
+
+        accepts the output of dumpz, as well as gzip streams
         """
-        if isinstance(stream, bytes):
-            stream = BytesIO(stream)
-        with gzip.open(stream, "rb") as wrapper:
-            return deserialize_value(wrapper, **kwargs)
+        if not isinstance(stream, _BYTES_TYPES):
+            stream = stream.read()
+        if stream[:2] == b"\x1f\x8b":
+            stream = gzip.decompress(stream)
+        else:
+            stream = zlib.decompress(stream)
+        return deserialize_value(BytesIO(stream), **kwargs)
 
     @classmethod
     def loads(cls, string, **kwargs):
@@ -632,7 +762,7 @@ class Serializable(object, metaclass=SerializableType):
         of type_id to message types. use the registry to deserialize
         the rest of the stream
         """
-        if isinstance(stream, bytes):
+        if isinstance(stream, _BYTES_TYPES):
             stream = BytesIO(stream)
         registry = deserialize_registry(stream)
         return deserialize_value(stream, registry=registry)
@@ -655,13 +785,12 @@ class Serializable(object, metaclass=SerializableType):
 
         inst = cls()
 
-        for field in inst._fields:
+        for field, type_, origin, args in cls._json_schema:
 
             if field in record:
-                origin = get_origin(inst.__annotations__[field])
+                if type_ is _NO_ANNOTATION:
+                    raise _missing_annotation(cls, field)
                 if origin is not None:
-                    args = get_args(inst.__annotations__[field])
-
                     if origin is list and isinstance(record[field], (Iterable, Sequence)):
                         lst = []
                         for rec in record[field]:
@@ -694,8 +823,7 @@ class Serializable(object, metaclass=SerializableType):
                     else:
                         raise TypeError("%s != %s" % (origin, type(record[field])))
                 else:
-                    setattr(inst, field, _fromJsonBasic(
-                        inst.__annotations__[field], field, record[field]))
+                    setattr(inst, field, _fromJsonBasic(type_, field, record[field]))
         return inst
 
     def toJson(self):
@@ -718,12 +846,12 @@ class Serializable(object, metaclass=SerializableType):
         JSON float values are not modified.
         """
         obj = {}
-        for field in self._fields:
+        for field, type_, origin, args in self._json_schema:
 
-            origin = get_origin(self.__annotations__[field])
-            if origin is not None:
-                args = get_args(self.__annotations__[field])
+            if type_ is _NO_ANNOTATION:
+                raise _missing_annotation(type(self), field)
 
+            if origin is not None:
                 record = getattr(self, field)
                 if origin is list and isinstance(record, (Iterable, Sequence)):
                     lst = []
@@ -761,7 +889,6 @@ class Serializable(object, metaclass=SerializableType):
                     raise TypeError("%s != %s" % (origin, type(record)))
 
             else:
-                type_ = self.__annotations__[field]
                 value = getattr(self, field)
                 obj[field] = _toJsonBasic(type_, field, value)
         return obj
@@ -784,11 +911,11 @@ class SerializableEnumType(type):
                 cls.type_id = SerializableType.next_type_id
                 SerializableType.next_type_id += 1
 
-        SerializableType.registry[cls.type_id] = cls
-        SerializableType.names[cls.__name__] = cls
+        SerializableType.register(cls)
 
         cls._value2name = {}
         cls._name2value = {}
+        cls._value2repr = {}
         SerializableEnumType._enums[cls.__name__] = cls
 
         for name in dir(cls):
@@ -796,6 +923,7 @@ class SerializableEnumType(type):
 
                 cls._value2name[getattr(cls, name)] = name
                 cls._name2value[name] = getattr(cls, name)
+                cls._value2repr[getattr(cls, name)] = "%s.%s" % (cls.__name__, name)
                 # wrap the value types as instances of enum
                 setattr(cls, name, cls(getattr(cls, name)))
         return cls
@@ -821,10 +949,10 @@ class SerializableEnum(object, metaclass=SerializableEnumType):
             raise ValueError(value)
 
     def __repr__(self):
-        return "%s.%s" % (self.__class__.__name__, self._value2name[self.value])
+        return self._value2repr[self.value]
 
     def __str__(self):
-        return "%s.%s" % (self.__class__.__name__, self._value2name[self.value])
+        return self._value2repr[self.value]
 
     def serialize_header(self, stream):
 
@@ -834,7 +962,7 @@ class SerializableEnum(object, metaclass=SerializableEnumType):
         :param stream: a file like object opened for writing bytes to.
 
         """
-        stream.write(struct.pack(">H", self.type_id))
+        stream.write(self._type_id_bytes)
 
     def serialize(self, stream, **kwargs):
         """ write the current value to a stream
@@ -103,6 +103,13 @@ class UdpServerThread(Thread):
         self.spt = self.ctxt.interval
 
     def append(self, addr, hdr, datagram):
+        """ queue a datagram received from addr for processing
+
+        :param addr: the remote address
+        :param hdr: the PacketHeader decoded from the datagram. The header
+            is decoded once, by the receiver, and is not parsed again
+        :param datagram: the bytes received
+        """
 
         with self.lk_queue:
             self.queue.append((addr, hdr, datagram))
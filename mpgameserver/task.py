@@ -2,7 +2,7 @@
 import sys
 import time
 
-from threading import Thread, Lock, Condition
+from threading import Thread, Lock, Condition, Event
 from multiprocessing import Pool
 from .logger import mplogger
 
@@ -22,6 +22,7 @@ class TaskPool(object):
 
         self._lk_result = Lock()
         self._results = []
+        self._completed = Event()
 
     def submit(self, fn, args=(), kwargs={}, callback=None, error_callback=None):
         """ submit a task to be run in a background process
@@ -42,20 +43,29 @@ class TaskPool(object):
     def _onSuccess(self, result, callback):
         with self._lk_result:
             self._results.append( (result, callback) )
+            self._completed.set()
 
     def _onFailure(self, ex, callback):
         with self._lk_result:
             self._results.append( (ex, callback) )
+            self._completed.set()
 
-    def update(self):
+    def update(self, block_ms=0):
         """ check for completed tasks and process the callbacks.
+
+        :param block_ms: the maximum time in milliseconds to wait for a task to complete
+        when no results are ready. The default, zero, never blocks.
         """
 
+        if block_ms > 0:
+            self._completed.wait(block_ms / 1000)
+
         results = []
         if self._results:
             with self._lk_result:
                 results = self._results
                 self._results = []
+                self._completed.clear()
 
             for result, callback in results:
                 if callback:
@@ -1,6 +1,7 @@
 #! cd .. && python -m tests.connection_benchmark
 import os
 import timeit
+import statistics
 import unittest
 
 from mpgameserver.connection import SeqNum, ConnectionBase, \
@@ -13,6 +14,18 @@ from mpgameserver import crypto
 
 from cryptography.hazmat.primitives.constant_time import bytes_eq
 
+def measure(fn, repeat=5):
+    """ time fn, returning the loop count and the best and median time per call
+
+    the number of loops is calibrated so that a single measurement takes
+    at least 0.2 seconds, then the measurement is repeated to estimate
+    the variance.
+    """
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    times = [t / loops for t in timer.repeat(repeat, loops)]
+    return loops, min(times), statistics.median(times)
+
 def encodedecode(pkt_size, key):
 
     pkt = Packet()
@@ -21,7 +34,8 @@ def encodedecode(pkt_size, key):
     pkt.msg = os.urandom(pkt_size)
     pkt.hdr = PacketHeader.create(False, 0, typ, SeqNum(1), SeqNum(1), 0)
     pkt.hdr.length = len(pkt.msg)
-    pkt.hdr.count = 1
+    # a message must contain at least the 2 byte message seqnum
+    pkt.hdr.count = 1 if pkt_size >= 2 else 0
     datagram = pkt.to_bytes(key)
     hdr = PacketHeader.from_bytes(True, datagram)
     pkt = Packet.from_bytes(hdr, key, datagram)
@@ -31,9 +45,8 @@ def benchmark_encodedecode():
 
     pkt_size = 128
     for pkt_size in [0, Packet.MAX_PAYLOAD_SIZE//4, Packet.MAX_PAYLOAD_SIZE//2, Packet.MAX_PAYLOAD_SIZE]:
-        for n in [10,50,100,500,1000,5000]:
-            result = timeit.timeit(lambda: encodedecode(pkt_size, key), number=n)
-            print("%5d %5d %.9f %.9f %d" % (pkt_size, n, result, result/n, 1/(result/n)))
+        loops, best, median = measure(lambda: encodedecode(pkt_size, key))
+        print("%5d %7d %.9f %.9f %d" % (pkt_size, loops, best, median, 1/best))
 
 def encryptdecrypt(fn_enc, fn_dec, key, iv, aad, data):
 
@@ -54,21 +67,35 @@ def benchmark_encryptdecrypt():
     key = os.urandom(16)
     aad = os.urandom(20)
     iv = aad[:12]
-    data = os.urandom(32)
 
+    # small payloads are dominated by per-call overhead. The larger sizes
+    # (a full datagram and multi-block payloads) show the throughput of
+    # the underlying cipher implementation, including any hardware
+    # acceleration (AES-NI, VAES) available to OpenSSL
+    data_sizes = [32, 1350, 8192, 16384]
 
     for algo in algos:
 
         fn_enc = getattr(crypto, 'encrypt_%s' % algo)
         fn_dec = getattr(crypto, 'decrypt_%s' % algo)
 
-        for n in [10,50,100,500,1000,5000,10000]:
-            result = timeit.timeit(lambda: encryptdecrypt(fn_enc, fn_dec, key, iv, aad, data), number=n)
-            print("%s %5d %.9f %.9f %d" % (algo, n, result, result/n, 1/(result/n)))
+        for data_sz in data_sizes:
+            data = os.urandom(data_sz)
+
+            loops, best, median = measure(lambda: encryptdecrypt(fn_enc, fn_dec, key, iv, aad, data))
+            print("%s %5d %7d %.9f %.9f %d" % (algo, data_sz, loops, best, median, 1/best))
 
 
 
 
+def benchmark_crc():
+
+    # unencrypted packets are validated with a crc32
+    for pkt_size in [0, Packet.MAX_PAYLOAD_SIZE//4, Packet.MAX_PAYLOAD_SIZE//2, Packet.MAX_PAYLOAD_SIZE]:
+        data = os.urandom(PacketHeader.SIZE + pkt_size)
+        loops, best, median = measure(lambda: crypto.crc32(data))
+        print("%5d %7d %.9f %.9f %d" % (pkt_size, loops, best, median, 1/best))
+
 def main():
 
     #print(Packet.MAX_PAYLOAD_SIZE*0x2000)
@@ -77,6 +104,7 @@ def main():
     #key = None
 
     benchmark_encryptdecrypt()
+    benchmark_crc()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -2,6 +2,8 @@
 import unittest
 import os
 
+from mpgameserver import connection
+
 from mpgameserver.connection import SeqNum, BitField, ConnectionBase, \
     Packet, PacketHeader, PacketType, ConnectionStatus, \
     PacketError, DuplicationError, PendingMessage, \
@@ -29,7 +31,7 @@ class ConnectionInitTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        pass
+        cls._encrypt_into = connection._AESGCM_ENCRYPT_INTO
 
     @classmethod
     def tearDownClass(cls):
@@ -80,6 +82,11 @@ class ConnectionInitTestCase(unittest.TestCase):
         self.assertTrue(a.newer_than(c))
         self.assertTrue(b.newer_than(a))
 
+        # instances are shared for a given value
+        self.assertIs(SeqNum(10), a)
+        self.assertIs(a + 6, b)
+        self.assertIs(SeqNum(), SeqNum(0))
+
     def test_bitfield(self):
 
         field = BitField(32)
@@ -107,132 +114,43 @@ class ConnectionInitTestCase(unittest.TestCase):
         self.assertEqual(SeqNum(1), conn.bitfield_pkt.current_seqnum)
         self.assertEqual("0x0", hex(conn.bitfield_pkt.bits))
 
-    def test_conn_handle_seq_sequential_1(self):
-        """
-        two packets are received in the correct sequential order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1233)
-        conn.bitfield_pkt.bits = 0xAAAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1234))
-
-        self.assertEqual(SeqNum(1234), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0xd5555555", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_sequential_2(self):
-        """
-        two packets are received in the correct sequential order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1233)
-        conn.bitfield_pkt.bits = 0xAAAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1235))
-
-        self.assertEqual(SeqNum(1235), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x6aaaaaaa", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_sequential_31(self):
-        """
-        two packets are received in the correct sequential order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1233)
-        conn.bitfield_pkt.bits = 0xAAAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1264))
-
-        self.assertEqual(SeqNum(1264), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x3", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_sequential_32(self):
-        """
-        two packets are received in the correct sequential order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1233)
-        conn.bitfield_pkt.bits = 0xAAAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1265))
-
-        self.assertEqual(SeqNum(1265), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x1", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_sequential_33(self):
-        """
-        two packets are received in the correct sequential order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1233)
-        conn.bitfield_pkt.bits = 0xAAAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1266))
-
-        self.assertEqual(SeqNum(1266), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x0", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_revered_order_1(self):
-        """
-        two packets are received in reversed order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1234)
-        conn.bitfield_pkt.bits = 0x0AAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1233))
-
-        self.assertEqual(SeqNum(1234), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x8aaaaaaa", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_revered_order_2(self):
-        """
-        two packets are received in reversed order
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1234)
-        conn.bitfield_pkt.bits = 0x0AAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1232))
-
-        self.assertEqual(SeqNum(1234), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x4aaaaaaa", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_seq_out_of_order_33(self):
-        """
-        two packets are received out of order with more
-        than 32 sequence numbers in between
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1234)
-        conn.bitfield_pkt.bits = 0x8AAAAAAA
-        conn.bitfield_pkt.insert(SeqNum(1201))
-
-        self.assertEqual(SeqNum(1234), conn.bitfield_pkt.current_seqnum)
-        self.assertEqual("0x8aaaaaaa", hex(conn.bitfield_pkt.bits))
-
-    def test_conn_handle_duplicate_last(self):
-        """
-        the most recent packet is duplicated
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1234)
-        conn.bitfield_pkt.bits = 0x8AAAAAAA
-        with self.assertRaises(DuplicationError) as e:
-            conn.bitfield_pkt.insert(SeqNum(1234))
-
-    def test_conn_handle_duplicate_acked(self):
-        """
-        a previously acked packet is received again
-        """
-
-        conn = ConnectionBase(False, None)
-        conn.bitfield_pkt.current_seqnum = SeqNum(1234)
-        conn.bitfield_pkt.bits = 0x8AAAAAAA
-        with self.assertRaises(DuplicationError) as e:
-            conn.bitfield_pkt.insert(SeqNum(1233))
+    # bitfield insert cases:
+    #   (description, current seqnum, bits, inserted seqnum,
+    #    expected seqnum, expected bits, expected exception)
+    SEQ_CASES = [
+        ("sequential_1",     1233, 0xAAAAAAAA, 1234, 1234, 0xd5555555, None),
+        ("sequential_2",     1233, 0xAAAAAAAA, 1235, 1235, 0x6aaaaaaa, None),
+        ("sequential_31",    1233, 0xAAAAAAAA, 1264, 1264, 0x00000003, None),
+        ("sequential_32",    1233, 0xAAAAAAAA, 1265, 1265, 0x00000001, None),
+        ("sequential_33",    1233, 0xAAAAAAAA, 1266, 1266, 0x00000000, None),
+        ("reversed_order_1", 1234, 0x0AAAAAAA, 1233, 1234, 0x8aaaaaaa, None),
+        ("reversed_order_2", 1234, 0x0AAAAAAA, 1232, 1234, 0x4aaaaaaa, None),
+        # more than 32 sequence numbers in between
+        ("out_of_order_33",  1234, 0x8AAAAAAA, 1201, 1234, 0x8aaaaaaa, None),
+        # the most recent packet is duplicated
+        ("duplicate_last",   1234, 0x8AAAAAAA, 1234, None, None, DuplicationError),
+        # a previously acked packet is received again
+        ("duplicate_acked",  1234, 0x8AAAAAAA, 1233, None, None, DuplicationError),
+    ]
+
+    def test_conn_handle_seq_all(self):
+        """
+        packets are received in sequential order, out of order, or duplicated
+        """
+
+        for name, current, bits, seq, expected_seq, expected_bits, error in self.SEQ_CASES:
+            with self.subTest(name=name):
+                field = BitField(32)
+                field.current_seqnum = SeqNum(current)
+                field.bits = bits
+
+                if error is not None:
+                    with self.assertRaises(error):
+                        field.insert(SeqNum(seq))
+                else:
+                    field.insert(SeqNum(seq))
+                    self.assertEqual(SeqNum(expected_seq), field.current_seqnum)
+                    self.assertEqual(hex(expected_bits), hex(field.bits))
 
     def test_conn_build_packet_keep_alive(self):
         """
@@ -303,6 +221,57 @@ class ConnectionInitTestCase(unittest.TestCase):
         self.assertEqual(2, pkt.hdr.count)
         self.assertEqual(Packet.overhead(2) + len(payload1) + len(payload2), pkt.hdr.length)
 
+    def test_conn_check_timeout(self):
+        # only packets older than the timeout are expired
+
+        current_time = 0
+
+        conn = ConnectionBase(False, None)
+        conn.clock = lambda: current_time
+        conn.status = ConnectionStatus.CONNECTED
+        conn.outgoing_timeout = 1.0
+
+        results = []
+        for i in range(3):
+            current_time = i
+            conn.send(b"hello", callback=results.append)
+            self.assertIsNotNone(conn._build_packet())
+
+        conn._check_timeout(2.5)
+        self.assertEqual(results, [False, False])
+        self.assertEqual(len(conn.pending_acks), 1)
+        self.assertEqual(conn.stats.timeouts, 2)
+
+        # at exactly the timeout the client expires the packet,
+        # the server waits until it is strictly older
+        conn._check_timeout(3.0, strict=True)
+        self.assertEqual(len(conn.pending_acks), 1)
+        conn._check_timeout(3.0)
+        self.assertEqual(len(conn.pending_acks), 0)
+        self.assertEqual(results, [False, False, False])
+
+    def test_conn_check_timeout_clock_step(self):
+        # the wall clock may step backwards between two packets
+
+        current_time = 0
+
+        conn = ConnectionBase(False, None)
+        conn.clock = lambda: current_time
+        conn.status = ConnectionStatus.CONNECTED
+        conn.outgoing_timeout = 1.0
+
+        results = []
+        for t in [100, 50]:
+            current_time = t
+            # allow sending immediately after the clock step
+            conn.last_send_time = -1
+            conn.send(b"hello", callback=results.append)
+            self.assertIsNotNone(conn._build_packet())
+
+        conn._check_timeout(52.0)
+        self.assertEqual(results, [False])
+        self.assertEqual(list(conn.pending_acks.values()), [100])
+
     def test_conn_receive_datagram_1(self):
 
         key = b"0"*16
@@ -321,6 +290,89 @@ class ConnectionInitTestCase(unittest.TestCase):
         self.assertEqual(1, len(conn.incoming_messages))
         self.assertEqual(msgs[0].payload, conn.incoming_messages[0][1])
 
+    def test_conn_session_cipher(self):
+        # the cipher cached by the connection produces the same
+        # datagram as encrypting with the raw key bytes
+        key = b"0"*16
+        hdr = PacketHeader.create(True, 0, PacketType.APP, SeqNum(1), SeqNum(1), 0)
+        msgs = [PendingMessage(SeqNum(1), PacketType.APP, b"hello world1", None, 0)]
+        pkt = Packet.create(hdr, msgs)
+
+        conn = ConnectionBase(False, None)
+        self.assertIsNone(conn._session_cipher)
+        conn.session_key_bytes = key
+        self.assertEqual(conn.session_key_bytes, key)
+
+        datagram = pkt.to_bytes(conn._session_cipher)
+        self.assertEqual(datagram, pkt.to_bytes(key))
+
+        pkt2 = Packet.from_bytes(PacketHeader.from_bytes(False, datagram), key, datagram)
+        self.assertEqual(pkt.msg, pkt2.msg)
+
+        conn.session_key_bytes = None
+        self.assertIsNone(conn._session_cipher)
+
+    def test_packet_header_round_trip(self):
+
+        hdr = PacketHeader.create(True, 1234, PacketType.APP, SeqNum(7), SeqNum(5), 0x0F)
+        hdr.length = 100
+        hdr.count = 3
+
+        hdr2 = PacketHeader.from_bytes(False, hdr.to_bytes())
+        for name in ('ctime', 'pkt_type', 'seq', 'ack', 'ack_bits', 'length', 'count'):
+            self.assertEqual(getattr(hdr, name), getattr(hdr2, name))
+        self.assertFalse(hasattr(hdr2, '__dict__'))
+
+    def test_packet_to_bytes_buffer(self):
+        # serializing into a reused buffer produces the same datagram
+        hdr = PacketHeader.create(True, 0, PacketType.APP, SeqNum(1), SeqNum(1), 0)
+        msgs = [PendingMessage(SeqNum(1), PacketType.APP, b"hello world1", None, 0)]
+        pkt = Packet.create(hdr, msgs)
+
+        buf = bytearray(Packet.RECV_SIZE)
+        for key in [None, b"0"*16]:
+            expected = pkt.to_bytes(key)
+            self.assertIsInstance(expected, bytes)
+            self.assertEqual(len(expected), pkt.total_size(key))
+            datagram = pkt.to_bytes(key, buf)
+            self.assertEqual(bytes(datagram), expected)
+
+            scratch = bytearray(Packet.RECV_SIZE)
+            datagram = pkt.to_bytes(key, buf, scratch)
+            self.assertEqual(bytes(datagram), expected)
+
+            hdr2 = PacketHeader.from_bytes(False, datagram)
+            pkt2 = Packet.from_bytes(hdr2, key, datagram)
+            self.assertEqual(bytes(pkt2.msg), pkt.msg)
+
+    def test_conn_build_and_encode(self):
+        # messages written directly into the datagram buffer and
+        # encrypted in place decode to the original messages
+        key = b"0"*16
+        buf = bytearray(Packet.RECV_SIZE)
+
+        for encrypt_into in [True, False]:
+            connection._AESGCM_ENCRYPT_INTO = encrypt_into
+            try:
+                conn = ConnectionBase(False, None)
+                conn.status = ConnectionStatus.CONNECTED
+                conn.session_key_bytes = key
+                conn.send(b"hello world1")
+                conn.send(b"hello world2")
+
+                datagram = conn._build_and_encode(buf)
+            finally:
+                connection._AESGCM_ENCRYPT_INTO = self._encrypt_into
+
+            hdr = PacketHeader.from_bytes(True, datagram)
+            pkt = Packet.from_bytes(hdr, key, datagram)
+            self.assertEqual(2, pkt.hdr.count)
+            self.assertEqual(b"hello world1", pkt.msgs[0].payload)
+            self.assertEqual(b"hello world2", pkt.msgs[1].payload)
+
+        # nothing to send
+        self.assertIsNone(conn._build_and_encode(buf))
+
     def test_packet_max_size(self):
         # test that forming a packet of max payload size
         # correctly builds a packet with the maximum number of
@@ -363,6 +415,23 @@ class ConnectionInitTestCase(unittest.TestCase):
         # reset mtu for subsequent tests
         Packet.setMTU(1500)
 
+    def test_packet_overhead(self):
+
+        self.assertEqual(Packet.overhead(0), 0)
+        self.assertEqual(Packet.overhead(1), 2)
+        self.assertEqual(Packet.overhead(2), 10)
+
+        # the lookup table must cover the maximum number of messages
+        # that can fit in a packet for a given MTU
+        for mtu in [512, 1500]:
+            Packet.setMTU(mtu)
+            n = Packet.MAX_PAYLOAD_SIZE // Packet.MESSAGE_OVERHEAD_N + 1
+            self.assertLess(n, len(Packet._OVERHEAD))
+            self.assertEqual(Packet.overhead(n), 5 * n)
+            self.assertEqual(Packet.overhead(n + 100), 5 * (n + 100))
+
+        Packet.setMTU(1500)
+
 class ConnectionTestCase(unittest.TestCase):
 
     @classmethod
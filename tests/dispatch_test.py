@@ -5,6 +5,7 @@ import unittest
 from mpgameserver import Serializable, SeqNum, \
     ServerMessageDispatcher, ClientMessageDispatcher, \
     server_event, client_event
+from mpgameserver.dispatch import DispatchError
 
 class Event1(Serializable):
     value: int = 0
@@ -88,6 +89,23 @@ class DispatchTestCase(unittest.TestCase):
         self.assertEqual(resource.event1.value, msg1.value)
         self.assertEqual(resource.event2.value, msg2.value)
 
+    def test_dispatch_unregistered(self):
+
+        resource = ClientResource()
+        dispatcher = ClientMessageDispatcher()
+        dispatcher.register(resource)
+
+        class Event3(Serializable):
+            value: int = 0
+
+        with self.assertRaises(DispatchError):
+            dispatcher.dispatch(SeqNum(), Event3(value=3))
+
+        # the cached handler is reused on subsequent dispatches
+        dispatcher.dispatch(SeqNum(), Event1(value=1))
+        dispatcher.dispatch(SeqNum(), Event1(value=2))
+        self.assertEqual(resource.event1.value, 2)
+
 def main():
     unittest.main()
 
@@ -14,40 +14,40 @@ class SampleResource(Resource):
 
     @get("/simple")
     def get_simple(self, request):
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @put("/simple")
     def put_simple(self, request):
         #print("headers %r" % request.headers)
         #print('len', int(request.headers[b'Content-Length'][0]))
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @post("/simple")
     def post_simple(self, request):
         #print("headers %r" % request.headers)
         #print('len', int(request.headers[b'Content-Length'][0]))
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @delete("/simple")
     def delete_simple(self, request):
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @get("/path/optone/:arg1?")
     def get_path_optone(self, request):
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @get("/path/optplus/:arg1+")
     def get_path_optplus(self, request):
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @get("/path/optmany/:arg1*")
     def get_path_optmany(self, request):
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
     @get("/params")
     def get_params(self, request):
         #print("params", request.params)
-        return JsonResponse({}, status_code=200)
+        return JsonResponse.empty()
 
 class HttpServerTestCase(unittest.TestCase):
 
@@ -72,6 +72,8 @@ class HttpServerTestCase(unittest.TestCase):
         response = self.client.sample_get_simple()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.request.path, "/simple")
+        self.assertEqual(response.payload, b"{}\n")
+        self.assertEqual(response.headers['Content-Length'], "3")
 
         response = self.client.sample_put_simple(headers={"Content-Length": 0}, body=io.BytesIO())
         self.assertEqual(response.status_code, 200)
@@ -104,6 +106,20 @@ class HttpServerTestCase(unittest.TestCase):
         response = self.client.sample_get_path_optplus("1", "2")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.request.path, "/path/optplus/1/2")
+        self.assertEqual(response.request.matches, {"arg1": "1/2"})
+
+    def test_route_not_found(self):
+
+        self.assertIsNone(self.router.getRoute("GET", "/path/optone/1/2"))
+        self.assertIsNone(self.router.getRoute("GET", "/unknown"))
+
+        endpt, matches = self.router.getRoute("GET", "/path/optone/1")
+        self.assertEqual(endpt.name, "sample.get_path_optone")
+        self.assertEqual(matches, {"arg1": "1"})
+
+        request = Request(("127.0.0.1", 0), "GET", "/unknown", {}, None, {}, None)
+        response = self.router.dispatch_request(request)
+        self.assertEqual(response.status_code, 404)
 
     def test_optmany(self):
 
@@ -114,6 +130,8 @@ class HttpServerTestCase(unittest.TestCase):
         response = self.client.sample_get_path_optmany("1", "2", "3")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.request.path, "/path/optmany/1/2/3")
+        # variadic components are captured as a single string
+        self.assertEqual(response.request.matches, {"arg1": "1/2/3"})
 
     def test_params(self):
         response = self.client.sample_get_params(params={"foo":"bar"})
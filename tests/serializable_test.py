@@ -5,6 +5,7 @@ from mpgameserver import serializable
 from mpgameserver.serializable import SerializableType, Serializable, SerializableEnum
 from io import BytesIO
 import struct
+import gzip
 
 class BasicTypes(Serializable):
     v1: int = 0
@@ -33,6 +34,11 @@ class Position(Serializable):
 class ColorSet(Serializable):
     colors: Set[Color] = None
 
+class SlotPosition(Serializable, slots=True):
+    x: int = 0
+    y: int = 0
+    tags: List[str] = None
+
 # additional structs with a custom type_id
 SerializableType.setRootId(__name__, 1024)
 class NoAnnoStruct(Serializable):
@@ -66,10 +72,55 @@ class SerializableTestCase(unittest.TestCase):
         msg2 = Serializable.loadb(payload)
 
         self.assertEqual(msg.v1, msg2.v1)
+        self.assertEqual(msg.v1, Serializable.loadb(memoryview(payload)).v1)
+        self.assertEqual(msg.v1, Serializable.loadb(bytearray(payload)).v1)
         self.assertEqual(msg.v3, msg2.v3)
         self.assertEqual(msg.v4, msg2.v4)
         self.assertTrue(abs(msg.v2 - msg2.v2) < 1e-6)
 
+    def test_serialize_wire_format(self):
+
+        msg = BasicTypes(v1=-300,v2=0.5,v3="abc",v4=True)
+        payload = msg.dumpb()
+
+        self.assertEqual(payload[:2], struct.pack(">H", BasicTypes.type_id))
+        self.assertEqual(payload[2:], b"\x00\x03\x04\x00\x04\xfe\xd4"
+            b"\x00\x0b?\x00\x00\x00\x00\r\x00\x03\x03abc\x00\x01\x01")
+
+    def test_serialize_generated(self):
+
+        msg = BasicTypes(v1=123,v2=3.14,v3="abc",v4=True)
+
+        stream1 = BytesIO()
+        msg.serialize(stream1)
+        stream2 = BytesIO()
+        Serializable.serialize(msg, stream2)
+        self.assertEqual(stream1.getvalue(), stream2.getvalue())
+
+        # a user defined serialize is inherited, not replaced
+        class CustomBase(Serializable):
+            def serialize(self, stream, **kwargs):
+                stream.write(b"custom")
+
+        class CustomChild(CustomBase):
+            v0: int = 0
+
+        self.assertEqual(CustomChild().dumpb()[2:], b"custom")
+        self.assertNotIn('serialize', vars(CustomChild))
+
+        # super().serialize() writes the fields of the derived class
+        class SuperBase(Serializable):
+            a: int = 1
+
+        class SuperChild(SuperBase):
+            b: int = 2
+            def serialize(self, stream, **kwargs):
+                stream.write(b"X")
+                super().serialize(stream, **kwargs)
+
+        self.assertEqual(SuperChild().dumpb()[2:], b"X\x00\x03\x01\x00\x03\x02")
+        self.assertNotIn('serialize', vars(SuperBase))
+
     def test_serialize_seq(self):
 
         msg = Users(users=[User(username='test')])
@@ -111,6 +162,36 @@ class SerializableTestCase(unittest.TestCase):
         self.assertTrue(Color.BLUE in msg2.colors)
         self.assertTrue(Color.GREEN in msg2.colors)
 
+    def test_serialize_slots(self):
+
+        msg = SlotPosition(x=32, tags=["a"])
+
+        self.assertFalse(hasattr(msg, '__dict__'))
+        self.assertEqual(SlotPosition._fields, ('x', 'y', 'tags'))
+        self.assertEqual(repr(msg), "SlotPosition({'x':32, 'y':0, 'tags':['a']})")
+
+        with self.assertRaises(AttributeError):
+            msg.z = 0
+
+        msg2 = Serializable.loadb(msg.dumpb())
+        self.assertEqual((msg2.x, msg2.y, msg2.tags), (32, 0, ["a"]))
+
+        msg2 = SlotPosition.loads(msg.dumps())
+        self.assertEqual((msg2.x, msg2.y, msg2.tags), (32, 0, ["a"]))
+
+    def test_serialize_slots_subclass(self):
+
+        class SlotBase(Serializable, slots=True):
+            x: int = 5
+
+        class SlotChild(SlotBase, slots=True):
+            y: int = 1
+
+        msg = SlotChild()
+        self.assertEqual((msg.x, msg.y), (5, 1))
+        self.assertEqual(SlotChild.__slots__, ('y',))
+        self.assertFalse(hasattr(msg, '__dict__'))
+
     def test_serialize_enum(self):
 
         self.assertTrue(Color.RED < Color.BLUE)
@@ -129,6 +210,19 @@ class SerializableTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             Color(1024)
 
+        # a member may be named value
+        class ValueEnum(SerializableEnum):
+            value=1
+            other=2
+        self.assertEqual(ValueEnum._name2value, {'value': 1, 'other': 2})
+        self.assertEqual(ValueEnum.value.value, 1)
+
+        # user defined enums may still set extra instance attributes
+        color = Color(1)
+        color.label = "red"
+        self.assertEqual(color.label, "red")
+        self.assertEqual(Color.RED._type_id_bytes, struct.pack(">H", Color.type_id))
+
     def test_json_basic(self):
 
         user = {"username": "test", "password": "test"}
@@ -205,6 +299,14 @@ class SerializableTestCase(unittest.TestCase):
         self.assertTrue('GREEN' in obj['colors'])
         self.assertTrue(isinstance(obj['colors'], list))
 
+    def test_json_missing_annotation(self):
+
+        with self.assertRaisesRegex(KeyError, "NoAnnoStruct.v0"):
+            NoAnnoStruct().toJson()
+
+        with self.assertRaisesRegex(KeyError, "NoAnnoStruct.v0"):
+            NoAnnoStruct.fromJson({'v0': 1})
+
     def test_json_null(self):
 
         colors = {'colors': None}
@@ -220,6 +322,13 @@ class SerializableTestCase(unittest.TestCase):
         user2 = User.loadz(enc)
         self.assertEqual(user.username, user2.username)
 
+        # gzip streams written by older versions can still be read
+        user2 = User.loadz(gzip.compress(user.dumpb()))
+        self.assertEqual(user.username, user2.username)
+
+        user2 = User.loadz(BytesIO(enc))
+        self.assertEqual(user.username, user2.username)
+
     def test_string_encode(self):
 
         user = User(username="admin", password="admin")
@@ -242,12 +351,14 @@ class SerializableTestCase(unittest.TestCase):
         stream = BytesIO()
         serializable.serialize_registry(stream)
 
-        stream.seek(0)
-
-        registry = serializable.deserialize_registry(stream)
+        registry = serializable.deserialize_registry(stream.getbuffer())
 
         for type_id, cls in registry.items():
             self.assertEqual(cls, SerializableType.registry[type_id])
+            self.assertEqual(cls, SerializableType.registry_list[type_id])
+
+        with self.assertRaises(serializable.SerializableHeaderError):
+            Serializable.loadb(b"\xFF\xFF")
 
     def test_registry_2(self):
 
@@ -1,6 +1,7 @@
 
 import unittest
-from threading import Lock
+from collections import deque
+from threading import Event
 import os
 import time
 from mpgameserver import ServerContext, EventHandler, EllipticCurvePublicKey, ConnectionStatus, EllipticCurvePrivateKey
@@ -12,20 +13,28 @@ class MockUDPSocket(object):
         super(MockUDPSocket, self).__init__()
         self.other = None
 
-        self.recv = []
-
-        self.lk = Lock()
+        # deque append and popleft are atomic, no lock is needed
+        # for a single producer and a single consumer
+        self.recv = deque()
+        # set when a datagram is received, cleared once the queue is drained
+        self.event = Event()
 
     def sendto(self, datagram, addr):
-        with self.lk:
-            self.other.recv.append((datagram, addr))
+        # copy, the sender may reuse the buffer for the next datagram
+        self.other.recv.append((bytes(datagram), addr))
+        self.other.event.set()
 
     def recvfrom(self, *args):
-        if self.recv:
-            with self.lk:
-                if self.recv:
-                    return self.recv.pop(0)
-        return None, None
+        try:
+            return self.recv.popleft()
+        except IndexError:
+            self.event.clear()
+            return None, None
+
+    def wait(self, timeout):
+        """ block until a datagram is received or the timeout expires
+        """
+        self.event.wait(timeout)
 
     @staticmethod
     def mkpair():
@@ -35,6 +44,20 @@ class MockUDPSocket(object):
         client.other = server
         return server, client
 
+def pump(sock, thread):
+    """ forward every datagram queued on the server socket to the server thread
+
+    returns the number of datagrams forwarded
+    """
+    count = 0
+    while True:
+        datagram, addr = sock.recvfrom(Packet.RECV_SIZE)
+        if not datagram:
+            return count
+        hdr = PacketHeader.from_bytes(True, datagram)
+        thread.append(addr, hdr, datagram)
+        count += 1
+
 class TestHandler(EventHandler):
     def handle_message(self, client, seqnum, msg: bytes):  # pragma: no cover
         client.send(msg)
@@ -56,21 +79,24 @@ class TestClient(object):
 
         self.conn.update()
 
-        datagram, addr = self.sock.recvfrom(Packet.RECV_SIZE)
-        if datagram:
+        while True:
+            datagram, addr = self.sock.recvfrom(Packet.RECV_SIZE)
+            if not datagram:
+                break
             hdr = PacketHeader.from_bytes(False, datagram)
             self.conn._recv_datagram(hdr, datagram)
 
-        pkt = self.conn._build_packet()
-        if pkt:
-            datagram = self.conn._encode_packet(pkt)
+        datagram = self.conn._build_and_encode(self.conn._tx_buf)
+        if datagram is not None:
             self.sock.sendto(datagram, self.addr)
 
 class Server1TestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        pass
+        # a server key and an unrelated public key, for the key mismatch test
+        cls.server_key = EllipticCurvePrivateKey.new()
+        cls.other_public_key = EllipticCurvePrivateKey.new().getPublicKey()
 
     @classmethod
     def tearDownClass(cls):
@@ -116,17 +142,14 @@ class Server1TestCase(unittest.TestCase):
         client.conn.outgoing_timeout = .25
         client.conn.connection_callback = callback
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         connected = False
         while not connected:
-            datagram, addr = server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                thread.append(addr, hdr, datagram)
+            pump(server_sock, thread)
             client.update()
-            time.sleep(1/60)
+            client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to connect")
 
             # test that both sides are connected
@@ -162,15 +185,15 @@ class Server1TestCase(unittest.TestCase):
 
         thread.start()
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         connected = False
         while not timedout:
             # receive and drop packets
             server_sock.recvfrom(Packet.RECV_SIZE)
             client.update()
-            time.sleep(1/60)
+            client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to connect")
 
             # test that both sides are connected
@@ -192,12 +215,10 @@ class Server1TestCase(unittest.TestCase):
         # not match the server public key
         server_sock, client_sock = MockUDPSocket.mkpair()
         client = TestClient(client_sock)
-        key = EllipticCurvePrivateKey.new()
-        key2 = EllipticCurvePrivateKey.new().getPublicKey()
 
-        client.conn.setServerPublicKey(key2)
+        client.conn.setServerPublicKey(self.other_public_key)
 
-        ctxt = ServerContext(TestHandler(), key)
+        ctxt = ServerContext(TestHandler(), self.server_key)
         thread = UdpServerThread(server_sock, ctxt)
 
         thread.start()
@@ -210,20 +231,17 @@ class Server1TestCase(unittest.TestCase):
         client.conn.outgoing_timeout = .25
         client.conn.connection_callback = callback
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         connected = False
 
         with self.assertRaises(EllipticCurvePublicKey.InvalidSignature):
 
             while not connected:
-                datagram, addr = server_sock.recvfrom(Packet.RECV_SIZE)
-                if datagram:
-                    hdr = PacketHeader.from_bytes(True, datagram)
-                    thread.append(addr, hdr, datagram)
+                pump(server_sock, thread)
                 client.update()
-                time.sleep(1/60)
+                client_sock.wait(1/60)
 
-                if time.time() - t0 > .5:
+                if time.monotonic() > deadline:
                     self.fail("failed to connect")
 
                 # test that both sides are connected
@@ -262,17 +280,14 @@ class Server2TestCase(unittest.TestCase):
 
         self.thread.start()
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         connected = False
         while not connected:
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            pump(self.server_sock, self.thread)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to connect")
 
             # test that both sides are connected
@@ -298,10 +313,7 @@ class Server2TestCase(unittest.TestCase):
 
         # sleep for 1 seconds to test send/recev keep alive
         for i in range(60):
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            pump(self.server_sock, self.thread)
             self.client.update()
             time.sleep(1/60)
 
@@ -317,32 +329,26 @@ class Server2TestCase(unittest.TestCase):
             disconnected = True
         self.client.conn.disconnect(onDisconnectCallback)
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         while not disconnected:
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            pump(self.server_sock, self.thread)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive disconnect")
 
     def test_server_send_recv(self):
 
         self.client.send(b"hello")
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         while not self.client.conn.incoming_messages:
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            pump(self.server_sock, self.thread)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive")
 
     def test_server_send_recv_large(self):
@@ -358,16 +364,13 @@ class Server2TestCase(unittest.TestCase):
         # round tripping 18 packets should take around 16/60 ~= 0.25 seconds
         # the test contsistently takes double the expected time
 
-        t0 = time.time()
+        deadline = time.monotonic() + 1.0
         while not self.client.conn.incoming_messages:
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            pump(self.server_sock, self.thread)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > 1.0:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive message")
 
         self.assertEqual(self.client.conn.incoming_messages[0][1], payload)
@@ -390,14 +393,14 @@ class Server2TestCase(unittest.TestCase):
         # round tripping 18 packets should take around 16/60 ~= 0.25 seconds
         # the test contsistently takes double the expected time
 
-        t0 = time.time()
+        deadline = time.monotonic() + 0.5
         while not timedout:
             # receive and drop
             self.server_sock.recvfrom(Packet.RECV_SIZE)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > 0.5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive message")
 
         self.assertTrue(timedout)
@@ -420,14 +423,14 @@ class Server2TestCase(unittest.TestCase):
         # round tripping 18 packets should take around 16/60 ~= 0.25 seconds
         # the test contsistently takes double the expected time
 
-        t0 = time.time()
+        deadline = time.monotonic() + 0.5
         while not timedout:
             # receive and drop
             self.server_sock.recvfrom(Packet.RECV_SIZE)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > 0.5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive message")
 
         self.assertTrue(timedout)
@@ -439,17 +442,13 @@ class Server2TestCase(unittest.TestCase):
         self.client.send(b"hello3")
 
         received = 0
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         while len(self.client.conn.incoming_messages) < 3:
-            datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
-            if datagram:
-                received += 1
-                hdr = PacketHeader.from_bytes(True, datagram)
-                self.thread.append(addr, hdr, datagram)
+            received += pump(self.server_sock, self.thread)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive")
 
         self.assertEqual(received, 1)
@@ -461,7 +460,7 @@ class Server2TestCase(unittest.TestCase):
         self.client.send(b"hello2")
         self.client.send(b"hello3")
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         while self.server_client.stats.dropped == 0:
             datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
             if datagram:
@@ -469,9 +468,9 @@ class Server2TestCase(unittest.TestCase):
                 self.thread.append(addr, hdr, datagram)
                 self.thread.append(addr, hdr, datagram)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive")
         self.assertEqual(self.server_client.stats.dropped, 1)
 
@@ -480,7 +479,7 @@ class Server2TestCase(unittest.TestCase):
 
         self.client.send(b"hello1")
 
-        t0 = time.time()
+        deadline = time.monotonic() + .5
         while self.server_client.stats.dropped == 0:
             datagram, addr = self.server_sock.recvfrom(Packet.RECV_SIZE)
             if datagram:
@@ -489,9 +488,9 @@ class Server2TestCase(unittest.TestCase):
                 hdr = PacketHeader.from_bytes(True, datagram)
                 self.thread.append(addr, hdr, datagram)
             self.client.update()
-            time.sleep(1/60)
+            self.client_sock.wait(1/60)
 
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("failed to receive")
         self.assertEqual(self.server_client.stats.dropped, 1)
 
@@ -1,6 +1,7 @@
 
 import unittest
 import time
+import threading
 from mpgameserver.task import TaskPool
 
 
@@ -10,6 +11,13 @@ def task1(x, y):
 def task2(x, y):
     raise ValueError()
 
+def run_until(pool, done, timeout=1.0):
+    """ process task callbacks until done is set or the timeout expires """
+    deadline = time.monotonic() + timeout
+    while not done.is_set() and time.monotonic() < deadline:
+        pool.update(block_ms=250)
+    return done.is_set()
+
 class TaskTestCase(unittest.TestCase):
 
     @classmethod
@@ -29,53 +37,47 @@ class TaskTestCase(unittest.TestCase):
     def test_task_success(self):
 
         result = None
+        done = threading.Event()
         def callback(res):
             nonlocal result
             result = res
+            done.set()
 
         self.pool.submit(task1, (6, 7),
             callback=callback, error_callback=callback)
 
-        for i in range(30):
-            self.pool.update()
-            if result is not None:
-                return
-            time.sleep(1/120)
+        self.assertTrue(run_until(self.pool, done), "timed out")
 
         self.assertEqual(42, result, str(result))
 
     def test_task_failure(self):
 
         result = None
+        done = threading.Event()
         def callback(res):
             nonlocal result
             result = res
+            done.set()
 
         self.pool.submit(task2, (6, 7),
             callback=callback, error_callback=callback)
 
-        for i in range(30):
-            self.pool.update()
-            if result is not None:
-                return
-            time.sleep(1/120)
+        self.assertTrue(run_until(self.pool, done), "timed out")
 
         self.assertTrue(isinstance(result, ValueError))
 
     def test_task_user_fail(self):
 
         result = None
+        done = threading.Event()
         def callback(res):
+            done.set()
             raise ValueError()
 
         self.pool.submit(task2, (6, 7),
             callback=callback, error_callback=callback)
 
-        for i in range(30):
-            self.pool.update()
-            if result is not None:
-                return
-            time.sleep(1/120)
+        self.assertTrue(run_until(self.pool, done), "timed out")
 
         self.assertEqual(None, result)
 
@@ -7,6 +7,7 @@ from mpgameserver.client import UdpClient
 from twisted.internet import reactor
 
 import time
+import threading
 
 class TestHandler(EventHandler):
 
@@ -62,19 +63,21 @@ class TwistedTestCase(unittest.TestCase):
     def test_2_connect(self):
 
         connected = None
+        done = threading.Event()
         def callback(success):
             nonlocal connected
             connected = success
+            done.set()
 
         client = UdpClient()
         client.connect(('localhost', 14741), callback=callback)
 
-        t0 = time.time()
-        while not connected:
+        deadline = time.monotonic() + .5
+        while not done.is_set():
             client.update()
-            time.sleep(1/60)
-            if time.time() - t0 > .5:
+            if time.monotonic() > deadline:
                 self.fail("timed out")
+            done.wait(0.005)
         self.assertTrue(connected)
         self.assertTrue(client.connected())
         self.assertEqual(client.status(), ConnectionStatus.CONNECTED)
@@ -21,13 +21,18 @@ class UtilTestCase(unittest.TestCase):
 
     def test_ipv6(self):
 
-        self.assertFalse(util.is_valid_ipv6_address("0.0.0.0"))
-
-        self.assertTrue(util.is_valid_ipv6_address("::"))
-        self.assertTrue(util.is_valid_ipv6_address("::1"))
-
-        self.assertTrue(util.is_valid_ipv6_address("2001:0db8:0000:0000:0000:ff00:0042:8329"))
-        self.assertTrue(util.is_valid_ipv6_address("2001:db8::ff00:42:8329"))
+        cases = [
+            ("0.0.0.0", False),
+            ("localhost", False),
+            ("2001:db8::ff00::8329", False),
+            ("::", True),
+            ("::1", True),
+            ("2001:0db8:0000:0000:0000:ff00:0042:8329", True),
+            ("2001:db8::ff00:42:8329", True),
+        ]
+
+        for addr, expected in cases:
+            self.assertEqual(util.is_valid_ipv6_address(addr), expected, addr)
 
 
 def main():
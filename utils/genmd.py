@@ -6,6 +6,7 @@ import sys
 sys.path.insert(0, os.getcwd())
 
 import mpgameserver
+import functools
 import inspect
 import types
 import pygame # side effect ensure installed
@@ -22,135 +23,187 @@ emoji_param = ""
 emoji_return = ""
 emoji_enum = ""
 
-def is_public_method(cls, attr):
+# markdown fragments shared by the generators, with the emoji folded in
+_HEADER = "---\n"
+_FMT_FUNCTION = emoji_function + " **%s**`%s` - %s\n"
+_FMT_METHOD = emoji_method + " **%s**`%s` - %s\n"
+_FMT_PARAM = "\n  * " + emoji_param + "**%s:** %s\n"
+_FMT_RETURN = "\n  * " + emoji_return + "**returns:** %s\n"
+_ENUM_HEADER = "| Attribute | Enum Value | Description |\n" \
+               "| :-------- | ---------: | :---------- |\n"
+
+# many classes share inherited methods, only compute each signature once
+_sig_cache = functools.lru_cache(maxsize=None)(inspect.signature)
+
+@functools.lru_cache(maxsize=None)
+def classify(cls, attr):
+    """ return 'class', 'static' or 'method' for a public method of cls
+
+    The attribute is resolved against the first class in the MRO that
+    defines it. None is returned for private names and anything that
+    is not a method. Results are cached per (cls, attr).
+    """
     if attr.startswith('_'):
-        return False
+        return None
 
-    value = getattr(cls, attr)
+    for o in cls.__mro__:
+        if attr in o.__dict__:
+            value = o.__dict__[attr]
+            break
+    else:
+        return None
 
-    return callable(value) and isinstance(value, types.FunctionType)
+    if isinstance(value, classmethod):
+        return 'class'
+    if isinstance(value, staticmethod):
+        return 'static'
+    if isinstance(value, types.FunctionType):
+        return 'method'
+    return None
+
+def is_public_method(cls, attr):
+    return classify(cls, attr) in ('static', 'method')
 
 def is_static_method(cls, attr):
-    if attr.startswith('_'):
-        return False
+    return classify(cls, attr) == 'static'
 
-    value = getattr(cls, attr)
+def is_class_method(cls, attr):
+    return classify(cls, attr) == 'class'
 
-    if inspect.isroutine(value):
-        for o in inspect.getmro(cls):
-            if attr in o.__dict__:
-                bound_value = o.__dict__[attr]
-                if isinstance(bound_value, staticmethod):
-                    return True
-    return False
+def categorize_members(cls, cls_vars):
+    """ sort the public members of a class into class, static and
+    regular methods in a single pass
 
-def is_class_method(cls, attr):
-    if attr.startswith('_'):
-        return False
+    Each list is returned in alphabetical order.
+    """
+    buckets = {'class': [], 'static': [], 'method': [], None: []}
 
-    value = getattr(cls, attr)
+    for attr in sorted(cls_vars):
+        buckets[classify(cls, attr)].append(attr)
 
-    if inspect.isroutine(value):
-        for o in inspect.getmro(cls):
-            if attr in o.__dict__:
-                bound_value = o.__dict__[attr]
-                if isinstance(bound_value, classmethod):
-                    return True
+    return buckets['class'], buckets['static'], buckets['method']
 
-    return False
+# classes are rendered in several documents, describe() caches the
+# parsed docstring and member categorization for each of them
+_CLASS_CACHE = {}
 
+def describe(cls, cls_vars=None):
+    """ return (summary, attrs, body, members) for a class
+
+    members is the (classmethods, staticmethods, methods) tuple
+    produced by categorize_members.
+    """
+    key = (cls, None if cls_vars is None else tuple(cls_vars))
+    result = _CLASS_CACHE.get(key)
+    if result is None:
+        summary, attrs, _, body = parse_doc(cls.__doc__, 'attr')
+        if cls_vars is None:
+            cls_vars = vars(cls)
+        members = categorize_members(cls, cls_vars)
+        result = _CLASS_CACHE[key] = (summary, attrs, body, members)
+    return result
+
+_EMPTY_PARAMS = types.MappingProxyType({})
+
+@functools.lru_cache(maxsize=None)
 def parse_doc(doc, markup='param'):
 
     if not doc:
-        return "", {}, "", []
+        return "", _EMPTY_PARAMS, "", ()
 
     tab = "  "
+    bullet = "\n" + tab + tab
+    marker = ":" + markup
+    marker_len = len(marker)
+    ret_marker = ":return"
+    ret_marker_len = len(ret_marker)
 
     summary = ""
     params = {}
     returns = ""
 
-    paragraphs = [[]]
+    paragraphs = []
 
-    code_block = False
-    for src_line in doc.splitlines():
-
-        if code_block:
-            # collect all lines in the code block as is
-            # until a terminator is found
-            paragraphs[-1].append(src_line)
-            if src_line.lstrip().startswith("```"):
-                code_block = False
-                paragraphs.append([])
-            continue
-
-        line = src_line.strip()
-        if line:
-            if line.startswith(":") and paragraphs[-1]:
-                # part of parameter or attribute documentation
-                paragraphs.append([])
-                paragraphs[-1].append(line)
-            elif line.startswith("|"):
-                # part of a table
-                paragraphs.append([])
-                paragraphs[-1].append(line)
-            elif line.startswith("```"):
-                # beginning of a code block
-                code_block = True
-                paragraphs.append([])
-                paragraphs[-1].append(src_line)
-            else:
-                paragraphs[-1].append(line)
-        else:
-            if paragraphs[-1]:
-                paragraphs.append([])
-
-    i = 0;
-    while i < len(paragraphs):
-        paragraph = paragraphs[i]
+    def emit(paragraph):
+        # classify a paragraph as soon as it is complete
+        nonlocal summary, returns
 
         if not paragraph:
-            i += 1
-            continue
+            paragraphs.append(paragraph)
 
-        if paragraph[0].lstrip().startswith("```"):
-            body = '\n'.join(paragraph)
-            paragraph.clear()
-            paragraph.append(body)
-            i += 1
+        elif paragraph[0].lstrip().startswith("```"):
+            paragraphs.append(['\n'.join(paragraph)])
 
-        elif paragraph[0].startswith(":%s" % markup):
+        elif paragraph[0].startswith(marker):
             for j, line in enumerate(paragraph):
                 if line.strip().startswith("*"):
-                    paragraph[j] = '\n%s%s' % (tab, tab) + line
+                    paragraph[j] = bullet + line
 
             text = ' '.join(paragraph)
-            text = text[len(":%s" % markup):]
+            text = text[marker_len:]
             name, text = text.split(':', 1)
             params[name.strip()] = text.strip()
-            paragraphs.pop(i)
-        elif paragraph[0].startswith(":return"):
+        elif paragraph[0].startswith(ret_marker):
             # parse
             # ":return x : y"
             # ":return: y"
             # ":returns: y"
             # yield y as a decscription of the return value
             text = ' '.join(paragraph)
-            text = text[len(":return"):]
+            text = text[ret_marker_len:]
             name, text = text.split(':', 1)
             returns = text.strip()
-            paragraphs.pop(i)
         elif not summary and not paragraph[0].strip().startswith("|"):
             # paragraph that is not a param def
             # and not a table def
             summary = ' '.join(paragraph)
-            paragraphs.pop(i)
         else:
-            i += 1
+            paragraphs.append(paragraph)
+
+    paragraph = []
+
+    code_block = False
+    for src_line in doc.splitlines():
+
+        if code_block:
+            # collect all lines in the code block as is
+            # until a terminator is found
+            paragraph.append(src_line)
+            if src_line.lstrip().startswith("```"):
+                code_block = False
+                emit(paragraph)
+                paragraph = []
+            continue
+
+        line = src_line.strip()
+        if line:
+            if line.startswith(":") and paragraph:
+                # part of parameter or attribute documentation
+                emit(paragraph)
+                paragraph = [line]
+            elif line.startswith("|"):
+                # part of a table
+                emit(paragraph)
+                paragraph = [line]
+            elif line.startswith("```"):
+                # beginning of a code block
+                code_block = True
+                emit(paragraph)
+                paragraph = [src_line]
+            else:
+                paragraph.append(line)
+        else:
+            if paragraph:
+                emit(paragraph)
+                paragraph = []
+
+    emit(paragraph)
 
-    return summary, params, returns, paragraphs
+    # results are cached and shared between callers, return read-only views
+    return summary, types.MappingProxyType(params), returns, \
+        tuple(tuple(paragraph) for paragraph in paragraphs)
 
-def genmd_function(stream, fn, name=None):
+def genmd_function(out, fn, name=None):
     tab = "  "
 
     if name is None:
@@ -159,48 +212,46 @@ def genmd_function(stream, fn, name=None):
     fn_name = name
 
     # * **`getPrivateKeyPEM()`** - return a string representation of the key
-    spec = inspect.getfullargspec(fn)
-    sig = inspect.signature(fn)
+    sig = _sig_cache(fn)
     summary, params, returns, body = parse_doc(fn.__doc__)
 
     if summary.startswith('private '):
         sys.stderr.write('ignoring private function %s\n' % fn_name)
         return
 
-    stream.write("%s **%s**`%s` - %s\n" % (emoji_function, fn_name, sig, summary))
+    out.append(_FMT_FUNCTION % (fn_name, sig, summary))
 
     for name, param in sig.parameters.items():
         if name == 'self':
             continue
 
-        desc = params.get(name, "")
+        desc = params.get(name, "") if params else ""
 
         if not desc:
             print("warning: no documentation for ", fn_name, name)
 
-        stream.write("\n%s* %s**%s:** %s\n" % (tab, emoji_param, name, desc))
+        out.append(_FMT_PARAM % (name, desc))
 
     if returns:
-        stream.write("\n%s* %s**%s:** %s\n" % (tab, emoji_return, 'returns', returns))
+        out.append(_FMT_RETURN % returns)
 
     if body:
-        stream.write("\n")
+        out.append("\n")
         for para in body:
             para_text = ' '.join(para)
             if "```" in para_text:
-                stream.write(para_text)
-                stream.write("\n\n")
+                out.append(para_text)
+                out.append("\n\n")
             else:
-                stream.write("%s%s\n\n" % (tab, para_text))
+                out.extend((tab, para_text, "\n\n"))
 
-def genmd_cls_method(stream, cls, attr):
+def genmd_cls_method(out, cls, attr):
 
     tab = "  "
     # * **`getPrivateKeyPEM()`** - return a string representation of the key
     #print("%s.%s" % (cls.__name__, attr))
     method = getattr(cls, attr)
-    spec = inspect.getfullargspec(method)
-    sig = inspect.signature(method)
+    sig = _sig_cache(method)
     summary, params, returns, body = parse_doc(method.__doc__)
 
     if summary.startswith('private '):
@@ -209,7 +260,7 @@ def genmd_cls_method(stream, cls, attr):
 
     meth_name = cls.__name__ if attr == '__init__' else method.__name__
 
-    stream.write("%s **%s**`%s` - %s\n" % (emoji_method, meth_name, sig, summary))
+    out.append(_FMT_METHOD % (meth_name, sig, summary))
 
     for name, param in sig.parameters.items():
         if name == 'self':
@@ -227,23 +278,23 @@ def genmd_cls_method(stream, cls, attr):
         #else:
         #    raise TypeError(param.annotation)
 
-        desc = params.get(name, "")
+        desc = params.get(name, "") if params else ""
 
         if not desc:
             print("warning: no documentation for ", cls.__name__, meth_name, name)
 
 
-        stream.write("\n%s* %s**%s:** %s\n" % (tab, emoji_param,name, desc))
+        out.append(_FMT_PARAM % (name, desc))
 
     if returns:
-        stream.write("\n%s* %s**%s:** %s\n" % (tab, emoji_return,'returns', returns))
+        out.append(_FMT_RETURN % returns)
 
     if body:
-        stream.write("\n")
+        out.append("\n")
         for para in body:
-            stream.write("%s%s\n\n" % (tab, ' '.join(para)))
+            out.extend((tab, ' '.join(para), "\n\n"))
 
-def genmd_cls(stream, cls, name=None, cls_vars=None):
+def genmd_cls(out, cls, name=None, cls_vars=None):
     """
     summary
     summary2
@@ -253,16 +304,16 @@ def genmd_cls(stream, cls, name=None, cls_vars=None):
 
     body
     """
-    stream.write("---\n")
+    out.append(_HEADER)
     if name:
-        # stream.write("## :large_blue_diamond: %s\n" % name)
-        stream.write("## %s\n" % name)
+        # out.append("## :large_blue_diamond: %s\n" % name)
+        out.append("## %s\n" % name)
     else:
-        #stream.write("## :large_blue_diamond: %s\n" % cls.__name__)
-        stream.write("## %s\n" % cls.__name__)
-    summary, attrs, _, body = parse_doc(cls.__doc__, 'attr')
+        #out.append("## :large_blue_diamond: %s\n" % cls.__name__)
+        out.append("## %s\n" % cls.__name__)
+    summary, attrs, body, members = describe(cls, cls_vars)
 
-    stream.write("%s\n\n" % summary)
+    out.append("%s\n\n" % summary)
 
     _prev_table = False
     for para in body:
@@ -271,14 +322,14 @@ def genmd_cls(stream, cls, name=None, cls_vars=None):
 
 
         if not _table and _prev_table:
-            stream.write('\n')
+            out.append('\n')
 
-        stream.write(text)
+        out.append(text)
 
         if _table:
-            stream.write('\n')
+            out.append('\n')
         else:
-            stream.write('\n\n')
+            out.append('\n\n')
         _prev_table = _table
 
     if cls_vars is None:
@@ -287,82 +338,79 @@ def genmd_cls(stream, cls, name=None, cls_vars=None):
     if "__init__" in cls_vars:
         doc = cls.__init__.__doc__ or ""
         if not doc.strip().startswith('private'):
-            stream.write("\n#### Constructor:\n\n")
-            genmd_cls_method(stream, cls, "__init__")
+            out.append("\n#### Constructor:\n\n")
+            genmd_cls_method(out, cls, "__init__")
 
     if attrs:
-        stream.write("\n#### Public Attributes:\n\n")
+        out.append("\n#### Public Attributes:\n\n")
         for name, text in sorted(attrs.items()):
-            stream.write("**`%s`**: %s\n\n" % (name, text))
+            out.append("**`%s`**: %s\n\n" % (name, text))
 
 
     tab = "  "
 
-    meths = [ attr for attr in cls_vars \
-        if is_class_method(cls, attr) ]
-
-    if meths:
-        stream.write("\n#### Class Methods:\n\n")
-        for attr in sorted(meths):
-            genmd_cls_method(stream, cls, attr)
-
-    meths = [ attr for attr in cls_vars \
-        if is_public_method(cls, attr) and is_static_method(cls, attr) ]
+    classmethods, staticmethods, methods = members
 
-    if meths:
-        stream.write("\n#### Static Methods:\n\n")
-        for attr in sorted(meths):
-            genmd_cls_method(stream, cls, attr)
+    if classmethods:
+        out.append("\n#### Class Methods:\n\n")
+        for attr in classmethods:
+            genmd_cls_method(out, cls, attr)
 
+    if staticmethods:
+        out.append("\n#### Static Methods:\n\n")
+        for attr in staticmethods:
+            genmd_cls_method(out, cls, attr)
 
-    meths = [ attr for attr in cls_vars \
-        if is_public_method(cls, attr) and not is_static_method(cls, attr) ]
+    if methods:
+        out.append("\n#### Methods:\n\n")
 
-    if meths:
-        stream.write("\n#### Methods:\n\n")
+        for attr in methods:
+            genmd_cls_method(out, cls, attr)
 
-        for attr in sorted(meths):
-            genmd_cls_method(stream, cls, attr)
-
-def genmd_enum(stream, cls, name=None, cls_vars=None):
-    stream.write("---\n")
+def genmd_enum(out, cls, name=None, cls_vars=None):
+    out.append(_HEADER)
     if name:
-        stream.write("## %s %s\n" % (emoji_enum, name))
+        out.append("## %s %s\n" % (emoji_enum, name))
     else:
-        stream.write("## %s %s\n" % (emoji_enum, cls.__name__))
-    summary, attrs, _, body = parse_doc(cls.__doc__, 'attr')
+        out.append("## %s %s\n" % (emoji_enum, cls.__name__))
+    summary, attrs, body, _ = describe(cls, cls_vars)
 
-    stream.write("%s\n\n" % summary)
+    out.append("%s\n\n" % summary)
 
     for para in body:
-        stream.write(' '.join(para))
-        stream.write('\n\n')
+        out.append(' '.join(para))
+        out.append('\n\n')
 
     if cls_vars is None:
         cls_vars = vars(cls)
 
-    stream.write("| Attribute | Enum Value | Description |\n")
-    stream.write("| :-------- | ---------: | :---------- |\n")
+    out.append(_ENUM_HEADER)
     if hasattr(cls, '_name2value'):
         for attr, value in sorted(cls._name2value.items(), key=lambda x: x[1]):
             desc = attrs.get(attr, "")
-            stream.write("| %s | %s | %s |\n" % (attr, value, desc))
+            out.append("| %s | %s | %s |\n" % (attr, value, desc))
+
+def write_doc(path, out):
+    """ write the collected fragments of a document to path in a single call
+    """
+    with open(path, "w") as wf:
+        wf.write("".join(out))
 
-def genmd_index(wf, classes=[], enums=[], functions=[]):
+def genmd_index(out, classes=[], enums=[], functions=[]):
     for cls, name, *rest in classes:
         if name is None:
             name = cls.__name__
-        wf.write("* [%s](#%s)\n" %(name, name.lower()))
+        out.append("* [%s](#%s)\n" %(name, name.lower()))
 
     for cls, name in enums:
         if name is None:
             name = cls.__name__
-        wf.write("* [%s](#%s)\n" %(name, name.lower()))
+        out.append("* [%s](#%s)\n" %(name, name.lower()))
 
     for fn, name in functions:
         if name is None:
             name = fn.__name__
-        wf.write("* [%s](#%s)\n" %(name, name.lower()))
+        out.append("* [%s](#%s)\n" %(name, name.lower()))
 
 
 def md_server():
@@ -384,19 +432,21 @@ def md_server():
         (mpgameserver.connection.RetryMode, None),
     ]
 
-    with open("docs/server.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(mpgameserver.server.__doc__)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(mpgameserver.server.__doc__)
+    out.append("\n")
 
-        genmd_index(wf, servers, enums)
+    genmd_index(out, servers, enums)
+
+    #out.append("\n---\n\nThere is currently two supported implementations of the server. A Headless implementation (no ui) or with a PyGame interface for metrics\n\n")
+    for args in servers:
+        genmd_cls(out, *args)
+    for cls, name in enums:
+        genmd_enum(out, cls, name)
 
-        #wf.write("\n---\n\nThere is currently two supported implementations of the server. A Headless implementation (no ui) or with a PyGame interface for metrics\n\n")
-        for args in servers:
-            genmd_cls(wf, *args)
-        for cls, name in enums:
-            genmd_enum(wf, cls, name)
+    write_doc("docs/server.md", out)
 
 def md_client():
 
@@ -409,18 +459,20 @@ def md_client():
         (mpgameserver.connection.RetryMode, None),
     ]
 
-    with open("docs/client.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(mpgameserver.client.__doc__)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(mpgameserver.client.__doc__)
+    out.append("\n")
 
-        genmd_index(wf, classes, enums)
+    genmd_index(out, classes, enums)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
-        for cls, name in enums:
-            genmd_enum(wf, cls, name)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
+    for cls, name in enums:
+        genmd_enum(out, cls, name)
+
+    write_doc("docs/client.md", out)
 
 def md_network():
 
@@ -438,18 +490,20 @@ def md_network():
         (mpgameserver.connection.ConnectionStatus, None),
         (mpgameserver.connection.RetryMode, None),
     ]
-    with open("docs/network.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(mpgameserver.connection.__doc__)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(mpgameserver.connection.__doc__)
+    out.append("\n")
 
-        genmd_index(wf, classes, enums)
+    genmd_index(out, classes, enums)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
-        for cls, name in enums:
-            genmd_enum(wf, cls, name)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
+    for cls, name in enums:
+        genmd_enum(out, cls, name)
+
+    write_doc("docs/network.md", out)
 
 def md_serializable():
 
@@ -458,15 +512,17 @@ def md_serializable():
         (mpgameserver.serializable.Serializable, None),
         (mpgameserver.serializable.SerializableEnum, None),
     ]
-    with open("docs/serializable.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write(mpgameserver.serializable.__doc__)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append(mpgameserver.serializable.__doc__)
+    out.append("\n")
+
+    genmd_index(out, classes)
 
-        genmd_index(wf, classes)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
+    write_doc("docs/serializable.md", out)
 
 def md_crypto():
 
@@ -475,16 +531,18 @@ def md_crypto():
         (mpgameserver.crypto.EllipticCurvePrivateKey, None),
         (mpgameserver.crypto.EllipticCurvePublicKey, None),
     ]
-    with open("docs/crypto.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(mpgameserver.crypto.__doc__)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(mpgameserver.crypto.__doc__)
+    out.append("\n")
 
-        genmd_index(wf, classes)
+    genmd_index(out, classes)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
+
+    write_doc("docs/crypto.md", out)
 
 def md_misc():
 
@@ -498,16 +556,18 @@ def md_misc():
         (mpgameserver.graph.LineGraph, None),
         (mpgameserver.graph.AreaGraph, None),
     ]
-    with open("docs/misc.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(doc)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(doc)
+    out.append("\n")
+
+    genmd_index(out, classes)
 
-        genmd_index(wf, classes)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
+    write_doc("docs/misc.md", out)
 
 def md_http():
 
@@ -542,23 +602,25 @@ def md_http():
         (mpgameserver.http_server.header, None),
         (mpgameserver.http_server.param, None),
     ]
-    with open("docs/http.md", "w") as wf:
-        wf.write("[Home](../README.md)\n\n")
-        wf.write("\n")
-        wf.write(doc)
-        wf.write("\n")
+    out = []
+    out.append("[Home](../README.md)\n\n")
+    out.append("\n")
+    out.append(doc)
+    out.append("\n")
 
-        genmd_index(wf, classes, enums, functions)
+    genmd_index(out, classes, enums, functions)
 
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
 
-        for cls, name in enums:
-            genmd_enum(wf, cls, name)
+    for cls, name in enums:
+        genmd_enum(out, cls, name)
+
+    out.append("\n## :cherry_blossom: Functions:\n\n")
+    for fn, name in functions:
+        genmd_function(out, fn, name)
 
-        wf.write("\n## :cherry_blossom: Functions:\n\n")
-        for fn, name in functions:
-            genmd_function(wf, fn, name)
+    write_doc("docs/http.md", out)
 
 
 def md_event_dispatch():
@@ -590,18 +652,20 @@ def md_event_dispatch():
         (mpgameserver.dispatch.server_event, None),
         (mpgameserver.dispatch.client_event, None),
     ]
-    with open("docs/event_dispatch.md", "w") as wf:
-        wf.write("[Home](../README.md)\n")
-        genmd_index(wf, classes)
-        wf.write("\n")
-        wf.write(doc)
-        wf.write("\n")
-        for cls, name, vars in classes:
-            genmd_cls(wf, cls, name, vars)
-
-        wf.write("\n## :cherry_blossom: Functions:\n\n")
-        for fn, name in functions:
-            genmd_function(wf, fn, name)
+    out = []
+    out.append("[Home](../README.md)\n")
+    genmd_index(out, classes)
+    out.append("\n")
+    out.append(doc)
+    out.append("\n")
+    for cls, name, vars in classes:
+        genmd_cls(out, cls, name, vars)
+
+    out.append("\n## :cherry_blossom: Functions:\n\n")
+    for fn, name in functions:
+        genmd_function(out, fn, name)
+
+    write_doc("docs/event_dispatch.md", out)
 
 def md_experimental():
 
@@ -618,14 +682,16 @@ def md_experimental():
         #(mpgameserver.captcha.Captcha, None),
         (mpgameserver.auth.Auth, None),
     ]
-    with open("docs/experimental.md", "w") as wf:
-        wf.write("[Home](../README.md)\n")
-        genmd_index(wf, classes)
-        wf.write("\n")
-        wf.write(doc)
-        wf.write("\n")
-        for cls, name in classes:
-            genmd_cls(wf, cls, name)
+    out = []
+    out.append("[Home](../README.md)\n")
+    genmd_index(out, classes)
+    out.append("\n")
+    out.append(doc)
+    out.append("\n")
+    for cls, name in classes:
+        genmd_cls(out, cls, name)
+
+    write_doc("docs/experimental.md", out)
 
 def md_engine():
 
@@ -675,35 +741,37 @@ def md_engine():
         (mpgameserver.pylon.AnimationComponent, None),
     ]
 
-    with open("docs/engine.md", "w") as wf:
-        wf.write("[Home](../README.md)\n")
+    out = []
+    out.append("[Home](../README.md)\n")
+
+    genmd_index(out, engine + user_input + components)
 
-        genmd_index(wf, engine + user_input + components)
+    out.append("\n")
+    out.append(doc)
+    out.append("\n")
 
-        wf.write("\n")
-        wf.write(doc)
-        wf.write("\n")
+    out.append("\n")
+    out.append(engine_intro)
+    out.append("\n")
 
-        wf.write("\n")
-        wf.write(engine_intro)
-        wf.write("\n")
+    for cls, name in engine:
+        genmd_cls(out, cls, name)
 
-        for cls, name in engine:
-            genmd_cls(wf, cls, name)
+    out.append("\n")
+    out.append(input_intro)
+    out.append("\n")
 
-        wf.write("\n")
-        wf.write(input_intro)
-        wf.write("\n")
+    for cls, name in user_input:
+        genmd_cls(out, cls, name)
 
-        for cls, name in user_input:
-            genmd_cls(wf, cls, name)
+    out.append("\n")
+    out.append(entity_intro)
+    out.append("\n")
 
-        wf.write("\n")
-        wf.write(entity_intro)
-        wf.write("\n")
+    for cls, name in components:
+        genmd_cls(out, cls, name)
 
-        for cls, name in components:
-            genmd_cls(wf, cls, name)
+    write_doc("docs/engine.md", out)
 
 def main():
 